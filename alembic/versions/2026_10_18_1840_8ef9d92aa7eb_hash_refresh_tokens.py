@@ -0,0 +1,116 @@
+"""hash_refresh_tokens
+
+Revision ID: 8ef9d92aa7eb
+Revises: dc3a880d038d
+Create Date: 2026-10-18 18:40:12.417305
+
+Expand step, instances of the previous release keep working: the plain
+refresh_token column stays, it becomes nullable, and a trigger hashes the
+tokens they still insert. The column is dropped by drop_plain_refresh_tokens
+once every instance runs the new code.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8ef9d92aa7eb'
+down_revision: Union[str, None] = 'dc3a880d038d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# every batch is committed on its own, so only 5000 rows are locked at once
+BACKFILL = """
+DO $$
+DECLARE
+    updated integer;
+BEGIN
+    LOOP
+        UPDATE auth_refresh_token
+        SET token_hash = encode(sha256(convert_to(refresh_token, 'UTF8')), 'hex'),
+            family_id = uuid
+        WHERE uuid IN (
+            SELECT uuid FROM auth_refresh_token
+            WHERE token_hash IS NULL
+            LIMIT 5000
+        );
+        GET DIAGNOSTICS updated = ROW_COUNT;
+        EXIT WHEN updated = 0;
+        COMMIT;
+    END LOOP;
+END $$
+"""
+
+
+# tokens inserted or rewritten by the previous release get their digest and family
+SYNC_FUNCTION = """
+CREATE OR REPLACE FUNCTION auth_refresh_token_sync_hash() RETURNS trigger AS $$
+BEGIN
+    IF NEW.refresh_token IS NOT NULL AND (
+        TG_OP = 'INSERT' OR NEW.refresh_token IS DISTINCT FROM OLD.refresh_token
+    ) THEN
+        NEW.token_hash := encode(sha256(convert_to(NEW.refresh_token, 'UTF8')), 'hex');
+    END IF;
+    NEW.family_id := coalesce(NEW.family_id, NEW.uuid);
+    RETURN NEW;
+END $$ LANGUAGE plpgsql
+"""
+SYNC_TRIGGER = """
+CREATE TRIGGER auth_refresh_token_sync_hash
+BEFORE INSERT OR UPDATE OF refresh_token ON auth_refresh_token
+FOR EACH ROW EXECUTE FUNCTION auth_refresh_token_sync_hash()
+"""
+
+NOT_NULL_COLUMNS = ('token_hash', 'family_id')
+
+
+def _not_null_check(column: str) -> str:
+    return f"ck_auth_refresh_token_{column}_not_null"
+
+
+def upgrade() -> None:
+    # don't queue every query on the table behind a blocked ALTER
+    op.execute("SET lock_timeout = '5s'")
+
+    op.add_column('auth_refresh_token', sa.Column('token_hash', sa.String(), nullable=True))
+    op.add_column('auth_refresh_token', sa.Column('family_id', sa.UUID(), nullable=True))
+    op.add_column('auth_refresh_token', sa.Column('rotated_at', sa.DateTime(), nullable=True))
+    # the new code doesn't write plain tokens any more
+    op.alter_column('auth_refresh_token', 'refresh_token', nullable=True)
+    # before the backfill, so no row of the old code is missed
+    op.execute(SYNC_FUNCTION)
+    op.execute(SYNC_TRIGGER)
+
+    with op.get_context().autocommit_block():
+        op.execute(BACKFILL)
+
+        op.create_index(op.f('ix_auth_refresh_token_token_hash'), 'auth_refresh_token', ['token_hash'],
+                        unique=True, postgresql_concurrently=True)
+        op.create_index(op.f('ix_auth_refresh_token_family_id'), 'auth_refresh_token', ['family_id'],
+                        unique=False, postgresql_concurrently=True)
+
+        # validated checks let SET NOT NULL skip the scan under an exclusive lock
+        for column in NOT_NULL_COLUMNS:
+            op.execute(f"ALTER TABLE auth_refresh_token ADD CONSTRAINT {_not_null_check(column)} "
+                       f"CHECK ({column} IS NOT NULL) NOT VALID")
+            op.execute(f"ALTER TABLE auth_refresh_token VALIDATE CONSTRAINT {_not_null_check(column)}")
+
+    for column in NOT_NULL_COLUMNS:
+        op.alter_column('auth_refresh_token', column, nullable=False)
+        op.execute(f"ALTER TABLE auth_refresh_token DROP CONSTRAINT {_not_null_check(column)}")
+
+
+def downgrade() -> None:
+    # gone already when downgraded from drop_plain_refresh_tokens
+    op.execute("DROP TRIGGER IF EXISTS auth_refresh_token_sync_hash ON auth_refresh_token")
+    op.execute("DROP FUNCTION IF EXISTS auth_refresh_token_sync_hash()")
+    # tokens issued by the new code have no plain value, they become invalid
+    op.execute("UPDATE auth_refresh_token SET refresh_token = token_hash WHERE refresh_token IS NULL")
+    op.alter_column('auth_refresh_token', 'refresh_token', nullable=False)
+
+    op.drop_index(op.f('ix_auth_refresh_token_family_id'), table_name='auth_refresh_token')
+    op.drop_index(op.f('ix_auth_refresh_token_token_hash'), table_name='auth_refresh_token')
+    op.drop_column('auth_refresh_token', 'rotated_at')
+    op.drop_column('auth_refresh_token', 'family_id')
+    op.drop_column('auth_refresh_token', 'token_hash')
@@ -0,0 +1,30 @@
+"""refresh_token_expires_at_index
+
+Revision ID: 70e0b08333e2
+Revises: 8ef9d92aa7eb
+Create Date: 2026-10-18 19:15:47.203618
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '70e0b08333e2'
+down_revision: Union[str, None] = '8ef9d92aa7eb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the purge looks up expired rows, build the index without locking writes
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_auth_refresh_token_expires_at'), 'auth_refresh_token', ['expires_at'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_auth_refresh_token_expires_at'), table_name='auth_refresh_token',
+                      postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""auth_user_email_unique_index
+
+Revision ID: 4a2148fd2d2e
+Revises: 70e0b08333e2
+Create Date: 2026-10-18 19:40:21.588104
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '4a2148fd2d2e'
+down_revision: Union[str, None] = '70e0b08333e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DUPLICATED_EMAILS = sa.text(
+    "SELECT lower(email) FROM auth_user GROUP BY lower(email) HAVING count(*) > 1 LIMIT 10"
+)
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode():
+        # a failed CREATE INDEX CONCURRENTLY leaves an invalid index behind, fail early
+        duplicated = op.get_bind().execute(DUPLICATED_EMAILS).scalars().all()
+        if duplicated:
+            raise RuntimeError(f"Merge the accounts sharing an email first: {', '.join(duplicated)}")
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_auth_user_email_lower', 'auth_user', [sa.text('lower(email)')],
+                        unique=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_auth_user_email_lower', table_name='auth_user', postgresql_concurrently=True)
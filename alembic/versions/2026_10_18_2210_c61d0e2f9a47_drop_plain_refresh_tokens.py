@@ -0,0 +1,33 @@
+"""drop_plain_refresh_tokens
+
+Revision ID: c61d0e2f9a47
+Revises: 4a2148fd2d2e
+Create Date: 2026-10-18 22:10:37.902114
+
+Contract step of hash_refresh_tokens, run it only after every instance
+runs the code which reads and writes token_hash.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c61d0e2f9a47'
+down_revision: Union[str, None] = '4a2148fd2d2e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # don't queue every query on the table behind a blocked ALTER
+    op.execute("SET lock_timeout = '5s'")
+
+    op.execute("DROP TRIGGER auth_refresh_token_sync_hash ON auth_refresh_token")
+    op.execute("DROP FUNCTION auth_refresh_token_sync_hash()")
+    op.drop_column('auth_refresh_token', 'refresh_token')
+
+
+def downgrade() -> None:
+    # plain tokens can't be restored, only the column of the expand step comes back
+    op.add_column('auth_refresh_token', sa.Column('refresh_token', sa.String(), nullable=True))
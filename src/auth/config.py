@@ -5,9 +5,36 @@ class AuthConfig(CustomSettings):
     JWT_ALG: str
     JWT_SECRET: str
     JWT_EXP: int = 5  # minutes
+    JWT_BACKEND: str = "jose"  # jose or pyjwt, pyjwt is needed for EdDSA keys
+    JWT_KEYS_DIR: str | None = None  # <kid>.pem EC P-256 or Ed25519 private keys
+    JWT_ACTIVE_KID: str | None = None  # signing key, the last one by name if not set
+    JWT_JWKS_MAX_AGE: int = 300  # seconds clients may cache the JWKS
+    JWT_CACHE_MAX_ITEMS: int = 10_000  # verified tokens kept per worker, 0 disables
 
     REFRESH_TOKEN_KEY: str = "refreshToken"
     REFRESH_TOKEN_EXP: int = 60 * 60 * 24 * 21  # 21 days
+    REFRESH_TOKEN_BACKEND: str = "postgres"  # postgres or redis
+    REFRESH_TOKEN_AUDIT: bool = True  # redis backend, also write tokens to postgres
+    REFRESH_TOKEN_KEY_PREFIX: str = "auth:refresh"
+    REFRESH_TOKEN_PURGE_INTERVAL: int = 60 * 60  # seconds, 0 disables the app job
+    # expired rows are kept this long, rotated ones are needed to detect reuse
+    REFRESH_TOKEN_PURGE_RETENTION: int = 60 * 60 * 24 * 21  # 21 days
+    REFRESH_TOKEN_PURGE_BATCH_SIZE: int = 5000  # rows deleted per statement
+    REFRESH_TOKEN_PURGE_PAUSE: float = 0.5  # seconds between batches
+
+    PASSWORD_HASH_ROUNDS: int = 12  # bcrypt cost factor
+    PASSWORD_HASHER_WORKERS: int = 4
+    PASSWORD_HASHER_MAX_PENDING: int = 32  # hashes queued or running per worker
+
+    USER_CACHE_TTL: int = 60 * 10  # seconds, updates and deletes write through
+    USER_CACHE_KEY_PREFIX: str = "auth:user"
+
+    USERS_BATCH_MAX_SIZE: int = 1000  # users created, updated or deleted at once
+    USERS_PAGE_SIZE: int = 100
+    USERS_PAGE_MAX_SIZE: int = 1000
+    USERS_STREAM_YIELD_PER: int = (
+        500  # rows fetched from the server-side cursor at once
+    )
 
     SECURE_COOKIES: bool = True
     SAMESITE_COOKIES: str = "none"
@@ -4,31 +4,33 @@ from typing import Annotated, Any
 from fastapi import Cookie, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncConnection
 
 from src.auth import service
 from src.auth.exceptions import (
-    EmailTakenError,
     FormValidationError,
     RefreshTokenNotFoundError,
     RefreshTokenNotValidError,
 )
 from src.auth.schemas import AuthUser
-
-
-async def valid_user_create(user: AuthUser) -> AuthUser:
-    if await service.get_user_by_email(user.email):
-        raise EmailTakenError()
-
-    return user
+from src.database import get_connection
 
 
 async def valid_refresh_token(
     refresh_token: str = Cookie(..., alias="refreshToken", include_in_schema=False),
+    connection: AsyncConnection = Depends(get_connection),
 ) -> dict[str, Any]:
-    db_refresh_token = await service.get_refresh_token(refresh_token)
+    db_refresh_token = await service.get_refresh_token(
+        refresh_token, connection=connection
+    )
     if not db_refresh_token:
         raise RefreshTokenNotFoundError()
 
+    if db_refresh_token["rotated_at"]:
+        # a rotated token is used again, it leaked, revoke its successors too
+        await service.expire_refresh_token_family(db_refresh_token)
+        raise RefreshTokenNotValidError()
+
     if not _is_valid_refresh_token(db_refresh_token):
         raise RefreshTokenNotValidError()
 
@@ -37,8 +39,11 @@ async def valid_refresh_token(
 
 async def valid_refresh_token_user(
     refresh_token: dict[str, Any] = Depends(valid_refresh_token),
+    connection: AsyncConnection = Depends(get_connection),
 ) -> dict[str, Any]:
-    user = await service.get_user_by_id(refresh_token["user_id"])
+    user = await service.get_user_profile(
+        refresh_token["user_id"], connection=connection
+    )
     if not user:
         raise RefreshTokenNotValidError()
 
@@ -1,5 +1,10 @@
 from src.auth.constants import ErrorCode
-from src.exceptions import BadRequestError, NotAuthenticatedError, PermissionDeniedError
+from src.exceptions import (
+    BadRequestError,
+    NotAuthenticatedError,
+    PermissionDeniedError,
+    ServiceUnavailableError,
+)
 
 
 class EmailTakenError(BadRequestError):
@@ -40,3 +45,7 @@ class RefreshTokenNotValidError(NotAuthenticatedError):
 
 class RefreshTokenNotFoundError(NotAuthenticatedError):
     error_code = ErrorCode.REFRESH_TOKEN_REQUIRED
+
+
+class PasswordHasherBusyError(ServiceUnavailableError):
+    error_code = ErrorCode.PASSWORD_HASHER_BUSY
@@ -1,10 +1,15 @@
+import importlib
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from functools import cache
 from typing import Any
 
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 
+from src.auth import keys
 from src.auth.config import auth_config
 from src.auth.exceptions import (
     AuthorizationFailedError,
@@ -12,9 +17,13 @@ from src.auth.exceptions import (
     InvalidTokenError,
 )
 from src.auth.schemas import JWTData
+from src.database import set_request_user
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/users/signin", auto_error=False)
 
+# verified token -> claims, signature check is skipped for tokens seen before
+_verified_tokens: OrderedDict[str, JWTData] = OrderedDict()
+
 
 def create_access_token(
     *,
@@ -27,7 +36,75 @@ def create_access_token(
         "is_admin": user["is_admin"],
     }
 
-    return jwt.encode(jwt_data, auth_config.JWT_SECRET, algorithm=auth_config.JWT_ALG)
+    return encode_token(jwt_data)
+
+
+@cache
+def _pyjwt() -> Any:
+    # PyJWT is imported by name, this module shadows it inside the package
+    return importlib.import_module("jwt")
+
+
+def encode_token(claims: dict[str, Any]) -> str:
+    key = keys.keyring.active
+    if key is None:
+        secret, algorithm, headers = auth_config.JWT_SECRET, auth_config.JWT_ALG, None
+    else:
+        secret, algorithm, headers = key.private_pem, key.alg, {"kid": key.kid}
+
+    if auth_config.JWT_BACKEND == "pyjwt":
+        return _pyjwt().encode(claims, secret, algorithm=algorithm, headers=headers)
+    return jwt.encode(claims, secret, algorithm=algorithm, headers=headers)
+
+
+def _verification_key(header: dict[str, Any]) -> tuple[str, str]:
+    kid = header.get("kid")
+    if kid is None:
+        # signed with the shared secret
+        return auth_config.JWT_SECRET, auth_config.JWT_ALG
+
+    key = keys.keyring.get(kid)
+    if key is None:
+        raise InvalidTokenError()
+    return key.public_pem, key.alg
+
+
+def decode_token(token: str) -> dict[str, Any]:
+    if auth_config.JWT_BACKEND == "pyjwt":
+        pyjwt = _pyjwt()
+        try:
+            secret, algorithm = _verification_key(pyjwt.get_unverified_header(token))
+            return pyjwt.decode(token, secret, algorithms=[algorithm])
+        except pyjwt.PyJWTError:
+            raise InvalidTokenError() from None
+
+    try:
+        secret, algorithm = _verification_key(jwt.get_unverified_header(token))
+        return jwt.decode(token, secret, algorithms=[algorithm])
+    except JWTError:
+        raise InvalidTokenError() from None
+
+
+def _get_verified_token(token: str) -> JWTData | None:
+    jwt_data = _verified_tokens.get(token)
+    if jwt_data is None:
+        return None
+
+    if jwt_data.expired_at.timestamp() <= time.time():
+        del _verified_tokens[token]
+        return None
+
+    _verified_tokens.move_to_end(token)
+    return jwt_data
+
+
+def _add_verified_token(token: str, jwt_data: JWTData) -> None:
+    if auth_config.JWT_CACHE_MAX_ITEMS <= 0:
+        return
+
+    _verified_tokens[token] = jwt_data
+    while len(_verified_tokens) > auth_config.JWT_CACHE_MAX_ITEMS:
+        _verified_tokens.popitem(last=False)
 
 
 async def parse_jwt_user_data_optional(
@@ -36,14 +113,13 @@ async def parse_jwt_user_data_optional(
     if not token:
         return None
 
-    try:
-        payload = jwt.decode(
-            token, auth_config.JWT_SECRET, algorithms=[auth_config.JWT_ALG]
-        )
-    except JWTError:
-        raise InvalidTokenError()
+    jwt_data = _get_verified_token(token)
+    if jwt_data is None:
+        jwt_data = JWTData(**decode_token(token))
+        _add_verified_token(token, jwt_data)
 
-    return JWTData(**payload)
+    set_request_user(jwt_data.user_id)
+    return jwt_data
 
 
 async def parse_jwt_user_data(
@@ -0,0 +1,132 @@
+import base64
+from pathlib import Path
+from typing import Any
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from src.auth.config import auth_config
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+class SigningKey:
+    """
+    Private key signing access tokens, published in the JWKS under its kid.
+    EC P-256 keys sign with ES256 and Ed25519 keys with EdDSA.
+    """
+
+    def __init__(self, kid: str, private_key: Any):
+        if isinstance(private_key, ec.EllipticCurvePrivateKey) and isinstance(
+            private_key.curve, ec.SECP256R1
+        ):
+            self.alg = "ES256"
+        elif isinstance(private_key, ed25519.Ed25519PrivateKey):
+            self.alg = "EdDSA"
+        else:
+            raise ValueError(f"Key {kid} must be an EC P-256 or Ed25519 private key")
+
+        self.kid = kid
+        self.private_pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode()
+        public_key = private_key.public_key()
+        self.public_pem = public_key.public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        ).decode()
+        self.jwk = {
+            "kid": kid,
+            "alg": self.alg,
+            "use": "sig",
+            **_public_jwk(public_key),
+        }
+
+    @classmethod
+    def from_pem(cls, kid: str, pem: bytes) -> "SigningKey":
+        return cls(kid, serialization.load_pem_private_key(pem, password=None))
+
+
+def _public_jwk(public_key: Any) -> dict[str, str]:
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        raw = public_key.public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw
+        )
+        return {"kty": "OKP", "crv": "Ed25519", "x": _b64url(raw)}
+
+    numbers = public_key.public_numbers()
+    return {
+        "kty": "EC",
+        "crv": "P-256",
+        "x": _b64url(numbers.x.to_bytes(32, "big")),
+        "y": _b64url(numbers.y.to_bytes(32, "big")),
+    }
+
+
+class KeyRing:
+    """
+    Signing keys kept in memory. New tokens are signed with the active key,
+    tokens signed with any key of the ring are accepted. To rotate, add the
+    new key, activate it and retire the old one after JWT_EXP minutes.
+    """
+
+    def __init__(self, keys: list[SigningKey] | None = None, active: str | None = None):
+        self._keys = {key.kid: key for key in keys or []}
+        self.active: SigningKey | None = None
+        self._jwks: dict[str, Any] | None = None
+        if active is not None:
+            self.activate(active)
+
+    def get(self, kid: str) -> SigningKey | None:
+        return self._keys.get(kid)
+
+    def add(self, key: SigningKey) -> None:
+        self._keys[key.kid] = key
+        self._jwks = None
+
+    def activate(self, kid: str) -> None:
+        if kid not in self._keys:
+            raise ValueError(f"Unknown signing key {kid}")
+        self.active = self._keys[kid]
+
+    def retire(self, kid: str) -> None:
+        if self.active is not None and self.active.kid == kid:
+            raise ValueError(f"Signing key {kid} is active")
+        self._keys.pop(kid, None)
+        self._jwks = None
+
+    def jwks(self) -> dict[str, Any]:
+        if self._jwks is None:
+            self._jwks = {"keys": [key.jwk for key in self._keys.values()]}
+        return self._jwks
+
+
+def load_keyring() -> KeyRing:
+    """
+    Load every <kid>.pem private key of JWT_KEYS_DIR. Without keys the tokens
+    are signed with JWT_SECRET.
+    """
+    if auth_config.JWT_BACKEND == "pyjwt":
+        from src.auth.jwt import _pyjwt  # jwt imports this module
+
+        _pyjwt()  # fail at startup, not on the first token, without PyJWT
+
+    if not auth_config.JWT_KEYS_DIR:
+        return KeyRing()
+
+    paths = sorted(Path(auth_config.JWT_KEYS_DIR).glob("*.pem"))
+    keys = [SigningKey.from_pem(path.stem, path.read_bytes()) for path in paths]
+    if not keys:
+        raise ValueError(f"No signing keys found in {auth_config.JWT_KEYS_DIR}")
+    if auth_config.JWT_BACKEND != "pyjwt" and any(k.alg == "EdDSA" for k in keys):
+        raise ValueError("EdDSA signing keys require JWT_BACKEND=pyjwt")
+
+    # name the files by date, e.g. 2024-06-01.pem, and the newest key signs
+    return KeyRing(keys, active=auth_config.JWT_ACTIVE_KID or keys[-1].kid)
+
+
+keyring = KeyRing()
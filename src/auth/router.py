@@ -1,13 +1,14 @@
-from typing import Annotated, Any
+from typing import Annotated, Any, AsyncGenerator
 
-from fastapi import APIRouter, BackgroundTasks, Body, Depends, Path, Response, status
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, Body, Depends, Path, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncConnection
 
-from src.auth import jwt, service, utils
+from src.auth import jwt, keys, service, utils
+from src.auth.config import auth_config
 from src.auth.dependencies import (
     valid_refresh_token,
     valid_refresh_token_user,
-    valid_user_create,
     validate_swagger_auth_form,
 )
 from src.auth.jwt import (
@@ -18,10 +19,14 @@ from src.auth.schemas import (
     AccessTokenResponse,
     AuthUser,
     JWTData,
+    NewUser,
     UpdateUser,
+    UpdateUsersRole,
+    UserIds,
     UserResponse,
 )
 from src.constants import Tags
+from src.database import get_connection
 
 router = APIRouter()
 
@@ -35,10 +40,10 @@ router = APIRouter()
     tags=[Tags.AUTH],
 )
 async def register_user(
-    auth_data: Annotated[AuthUser, Depends(valid_user_create)],
-) -> dict[str, str]:
+    auth_data: AuthUser,
+) -> dict[str, Any]:
     user = await service.create_user(auth_data)
-    return jsonable_encoder(user)
+    return user
 
 
 @router.get(
@@ -49,9 +54,9 @@ async def register_user(
 )
 async def my_account(
     jwt_data: Annotated[JWTData, Depends(parse_jwt_user_data)],
-) -> dict[str, str]:
-    user = await service.get_user_by_id(jwt_data.user_id)
-    return jsonable_encoder(user)
+) -> dict[str, Any]:
+    user = await service.get_user_profile(jwt_data.user_id)
+    return user
 
 
 @router.get(
@@ -114,9 +119,9 @@ async def update_user(
             },
         ),
     ],
-) -> dict[str, str]:
+) -> dict[str, Any]:
     user = await service.update_user(user_id, upd_data)
-    return jsonable_encoder(user)
+    return user
 
 
 @router.get(
@@ -127,8 +132,35 @@ async def update_user(
     status_code=status.HTTP_200_OK,
     tags=[Tags.ADMIN],
 )
-async def all_users() -> list[UserResponse]:
-    return [UserResponse(**user) for user in await service.all_users()]
+async def all_users(
+    response: Response,
+    limit: Annotated[
+        int, Query(ge=1, le=auth_config.USERS_PAGE_MAX_SIZE)
+    ] = auth_config.USERS_PAGE_SIZE,
+    after: Annotated[
+        int | None, Query(ge=0, description="X-Next-Cursor of the previous page")
+    ] = None,
+    stream: Annotated[
+        bool, Query(description="Every user after the cursor as NDJSON")
+    ] = False,
+) -> list[dict[str, Any]] | StreamingResponse:
+    if stream:
+        return StreamingResponse(
+            _ndjson_users(service.stream_users(after=after)),
+            media_type="application/x-ndjson",
+        )
+
+    users = await service.get_users_page(after=after, limit=limit)
+    if len(users) == limit:
+        response.headers["X-Next-Cursor"] = str(users[-1]["id"])
+    return users
+
+
+async def _ndjson_users(
+    users: AsyncGenerator[dict[str, Any], None],
+) -> AsyncGenerator[str, None]:
+    async for user in users:
+        yield UserResponse(**user).model_dump_json(exclude_none=True) + "\n"
 
 
 @router.delete(
@@ -145,8 +177,59 @@ async def delete_user(
             ge=0,
         ),
     ],
+    connection: Annotated[AsyncConnection, Depends(get_connection)],
 ) -> None:
-    await service.delete_user(user_id)
+    await service.delete_user(user_id, connection=connection)
+
+
+@router.post(
+    "/users/batch",
+    dependencies=[Depends(validate_admin_access)],
+    response_model_exclude_none=True,
+    response_model=list[UserResponse],
+    status_code=status.HTTP_201_CREATED,
+    tags=[Tags.ADMIN],
+)
+async def create_users(
+    users: Annotated[
+        list[NewUser],
+        Body(min_length=1, max_length=auth_config.USERS_BATCH_MAX_SIZE),
+    ],
+) -> list[dict[str, Any]]:
+    """Create the users, emails already taken are skipped and not returned"""
+    return await service.create_users(users)
+
+
+@router.patch(
+    "/users/batch",
+    dependencies=[Depends(validate_admin_access)],
+    response_model_exclude_none=True,
+    response_model=list[UserResponse],
+    status_code=status.HTTP_200_OK,
+    tags=[Tags.ADMIN],
+)
+async def update_users_role(
+    upd_data: UpdateUsersRole,
+    connection: Annotated[AsyncConnection, Depends(get_connection)],
+) -> list[dict[str, Any]]:
+    """Set the role of the users, unknown ids are skipped and not returned"""
+    return await service.set_users_role(
+        upd_data.ids, upd_data.is_admin, connection=connection
+    )
+
+
+@router.delete(
+    "/users/batch",
+    dependencies=[Depends(validate_admin_access)],
+    status_code=status.HTTP_200_OK,
+    tags=[Tags.ADMIN],
+)
+async def delete_users(
+    user_ids: UserIds,
+    connection: Annotated[AsyncConnection, Depends(get_connection)],
+) -> list[int]:
+    """Delete the users, returns the ids that existed"""
+    return await service.delete_users(user_ids.ids, connection=connection)
 
 
 @router.post(
@@ -176,6 +259,8 @@ async def auth_swagger(
     tags=[Tags.AUTH],
 )
 async def auth_user(response: Response, auth_data: AuthUser) -> AccessTokenResponse:
+    # no request connection here, it would stay checked out during the slow
+    # password check
     user = await service.authenticate_user(auth_data)
     refresh_token_value = await service.create_refresh_token(user_id=user["id"])
 
@@ -193,17 +278,16 @@ async def auth_user(response: Response, auth_data: AuthUser) -> AccessTokenRespo
     tags=[Tags.AUTH],
 )
 async def refresh_tokens(
-    worker: BackgroundTasks,
     response: Response,
     refresh_token: Annotated[dict[str, Any], Depends(valid_refresh_token)],
     user: Annotated[dict[str, Any], Depends(valid_refresh_token_user)],
+    connection: Annotated[AsyncConnection, Depends(get_connection)],
 ) -> AccessTokenResponse:
-    refresh_token_value = await service.create_refresh_token(
-        user_id=refresh_token["user_id"]
+    refresh_token_value = await service.rotate_refresh_token(
+        refresh_token, connection=connection
     )
     response.set_cookie(**utils.get_refresh_token_settings(refresh_token_value))
 
-    worker.add_task(service.expire_refresh_token, refresh_token["uuid"])
     return AccessTokenResponse(
         access_token=jwt.create_access_token(user=user),
         refresh_token=refresh_token_value,
@@ -217,9 +301,19 @@ async def refresh_tokens(
 async def logout_user(
     response: Response,
     refresh_token: Annotated[dict[str, Any], Depends(valid_refresh_token)],
+    connection: Annotated[AsyncConnection, Depends(get_connection)],
 ) -> None:
-    await service.expire_refresh_token(refresh_token["uuid"])
+    await service.expire_refresh_token(refresh_token, connection=connection)
+
+    response.delete_cookie(**utils.get_refresh_token_settings("", expired=True))
 
-    response.delete_cookie(
-        **utils.get_refresh_token_settings(refresh_token["refresh_token"], expired=True)
+
+@router.get(
+    "/.well-known/jwks.json",
+    tags=[Tags.AUTH],
+)
+async def jwks(response: Response) -> dict[str, Any]:
+    response.headers["Cache-Control"] = (
+        f"public, max-age={auth_config.JWT_JWKS_MAX_AGE}"
     )
+    return keys.keyring.jwks()
@@ -11,9 +11,11 @@ from pydantic import (
     ValidationInfo,
 )
 
+from src.auth.config import auth_config
 from src.models.models import CustomModel
 
 STRONG_PASSWORD_PATTERN = re.compile(r"^(?=.*[\d])(?=.*[!@#$%^&*])[\w!@#$%^&*]{6,128}$")
+BCRYPT_HASH_PATTERN = r"^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$"
 
 
 def valid_password(password: str, info: ValidationInfo) -> str:
@@ -58,6 +60,28 @@ class AdminUser(AuthUser):
     is_admin: bool = True
 
 
+class NewUser(AuthUser):
+    is_admin: bool = False
+
+
+class HashedUser(CustomModel):
+    """User imported with a password already hashed by bcrypt"""
+
+    email: EmailStr
+    password_hash: Annotated[str, Field(pattern=BCRYPT_HASH_PATTERN)]
+    is_admin: bool = False
+
+
+class UserIds(CustomModel):
+    ids: Annotated[
+        list[int], Field(min_length=1, max_length=auth_config.USERS_BATCH_MAX_SIZE)
+    ]
+
+
+class UpdateUsersRole(UserIds):
+    is_admin: bool
+
+
 class UpdateUser(CustomModel):
     email: Annotated[EmailStr | None, Field(default=None)]
     is_admin: Annotated[bool | None, Field(default=None)]
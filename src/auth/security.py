@@ -1,11 +1,20 @@
+import asyncio
 import base64
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
 
 import bcrypt
 
+from src.auth.config import auth_config
+from src.auth.exceptions import PasswordHasherBusyError
+
+_hasher_pool: ThreadPoolExecutor | None = None
+_hasher_pending: int = 0
+
 
 def hash_password(password: str) -> str:
     pw = bytes(password, "utf-8")
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=auth_config.PASSWORD_HASH_ROUNDS)
     return bcrypt.hashpw(pw, salt).decode()
 
 
@@ -15,6 +24,65 @@ def check_password(password: str, password_in_db: str) -> bool:
     return bcrypt.checkpw(pw_bytes, pw_in_db_bytes)
 
 
+def _get_hasher_pool() -> ThreadPoolExecutor:
+    global _hasher_pool
+    if _hasher_pool is None:
+        _hasher_pool = ThreadPoolExecutor(
+            max_workers=auth_config.PASSWORD_HASHER_WORKERS,
+            thread_name_prefix="password-hasher",
+        )
+    return _hasher_pool
+
+
+async def _run_in_hasher_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run bcrypt outside the event loop, bcrypt releases the GIL,
+    so a small thread pool is enough to keep the loop responsive.
+    Shed the load when too many hashes are already waiting for a thread.
+    """
+    global _hasher_pending
+    if _hasher_pending >= auth_config.PASSWORD_HASHER_MAX_PENDING:
+        raise PasswordHasherBusyError()
+
+    _hasher_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hasher_pool(), func, *args)
+    finally:
+        _hasher_pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_hasher_pool(hash_password, password)
+
+
+async def hash_passwords_async(passwords: list[str]) -> list[str]:
+    """
+    Hash a batch on every hasher thread, at most one hash per thread is queued
+    at a time, so single hashes of other requests don't wait for the batch.
+    """
+    semaphore = asyncio.Semaphore(auth_config.PASSWORD_HASHER_WORKERS)
+
+    async def hash_one(password: str) -> str:
+        async with semaphore:
+            return await hash_password_async(password)
+
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(hash_one(password)) for password in passwords]
+    return [task.result() for task in tasks]
+
+
+async def check_password_async(password: str, password_in_db: str) -> bool:
+    return await _run_in_hasher_pool(check_password, password, password_in_db)
+
+
+def shutdown_hasher_pool() -> None:
+    global _hasher_pool
+    if _hasher_pool is not None:
+        _hasher_pool.shutdown(wait=False, cancel_futures=True)
+        _hasher_pool = None
+
+
 def b64e(s: str) -> str:
     """encode string to base64"""
     return base64.b64encode(s.encode("utf-8")).decode("utf-8")
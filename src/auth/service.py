@@ -1,39 +1,125 @@
-import uuid
+import asyncio
+import time
 from datetime import datetime, timedelta
-from typing import Any
+from functools import partial
+from typing import Any, AsyncGenerator
+
+from fastapi.logger import logger
+from redis.exceptions import RedisError
+from sqlalchemy import (
+    ARRAY,
+    Boolean,
+    DateTime,
+    Integer,
+    String,
+    any_,
+    bindparam,
+    column,
+    func,
+    select,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection
 
+from src.auth import user_cache
 from src.auth.config import auth_config
 from src.auth.exceptions import (
+    EmailTakenError,
     InvalidCredentialsError,
     InvalidEmailError,
     InvalidUserIDError,
+    RefreshTokenNotValidError,
+)
+from src.auth.schemas import AuthUser, NewUser, UpdateUser
+from src.auth.security import (
+    check_password_async,
+    hash_password_async,
+    hash_passwords_async,
 )
-from src.auth.schemas import AuthUser, UpdateUser
-from src.auth.security import check_password, hash_password
+from src.auth.token_store import refresh_token_store
 from src.auth.utils import get_token
-from src.database import auth_user, execute, fetch_all, fetch_one, refresh_tokens
+from src.database import (
+    after_commit,
+    auth_user,
+    begin,
+    execute,
+    fetch_all,
+    fetch_one,
+    read_from_primary,
+    refresh_tokens,
+    stream_all,
+)
+from src.redis import get_lock
+
+# Built once for the hot paths, SQLAlchemy then skips building the statement
+# and its cache key on every call and goes straight to the compiled cache.
+select_user_by_id = auth_user.select().where(auth_user.c.id == bindparam("user_id"))
+select_user_by_email = auth_user.select().where(
+    func.lower(auth_user.c.email) == bindparam("email")
+)
+
+# batches are passed as arrays, one statement whatever the batch size
+_batch_ids = any_(bindparam("ids", type_=ARRAY(Integer)))
+_new_users = func.unnest(
+    bindparam("emails", type_=ARRAY(String)),
+    bindparam("passwords", type_=ARRAY(String)),
+    bindparam("is_admins", type_=ARRAY(Boolean)),
+).table_valued(
+    column("email", String), column("password", String), column("is_admin", Boolean)
+)
+insert_users = (
+    insert(auth_user)
+    .from_select(
+        ["email", "password", "is_admin", "created_at"],
+        select(
+            _new_users.c.email,
+            _new_users.c.password,
+            _new_users.c.is_admin,
+            bindparam("created_at", type_=DateTime),
+        ),
+    )
+    .on_conflict_do_nothing(index_elements=[func.lower(auth_user.c.email)])
+    .returning(auth_user)
+)
+update_users_role = (
+    auth_user.update()
+    .where(auth_user.c.id == _batch_ids)
+    .values(is_admin=bindparam("role"), updated_at=bindparam("role_updated_at"))
+    .returning(auth_user)
+)
+delete_users_by_id = (
+    auth_user.delete().where(auth_user.c.id == _batch_ids).returning(auth_user.c.id)
+)
 
 
-async def create_user(user: AuthUser) -> dict[str, Any] | None:
+async def create_user(
+    user: AuthUser, *, connection: AsyncConnection | None = None
+) -> dict[str, Any]:
     insert_query = (
-        auth_user.insert()
+        insert(auth_user)
         .values(
             {
                 "email": user.email,
-                "password": hash_password(user.password),
+                "password": await hash_password_async(user.password),
                 "created_at": datetime.now(),
             }
         )
+        .on_conflict_do_nothing(index_elements=[func.lower(auth_user.c.email)])
         .returning(auth_user)
     )
-    return await fetch_one(insert_query)
+    created_user = await fetch_one(insert_query, connection)
+    if not created_user:
+        raise EmailTakenError()
 
+    return created_user
 
-async def update_user(user_id: int, user_data: UpdateUser) -> dict[str, Any] | None:
-    user = await get_user_by_id(user_id)
-    if not user:
-        raise InvalidUserIDError()
 
+async def update_user(user_id: int, user_data: UpdateUser) -> dict[str, Any]:
+    """
+    The new password is hashed before a connection is checked out, the update
+    and the expiry of the refresh tokens run in one transaction after it.
+    """
     data = {
         "updated_at": datetime.now(),
     }
@@ -47,7 +133,7 @@ async def update_user(user_id: int, user_data: UpdateUser) -> dict[str, Any] | N
     if user_data.password:
         data.update(
             {
-                "password": hash_password(user_data.password),
+                "password": await hash_password_async(user_data.password),
             }
         )
     if user_data.is_admin is not None:
@@ -63,77 +149,229 @@ async def update_user(user_id: int, user_data: UpdateUser) -> dict[str, Any] | N
         .where(auth_user.c.id == user_id)
         .returning(auth_user)
     )
+    async with begin() as connection:
+        try:
+            user = await fetch_one(update_query, connection)
+        except IntegrityError as er:
+            raise EmailTakenError() from er
+        if not user:
+            raise InvalidUserIDError()
+
+        if user_data.password:
+            await expire_user_refresh_tokens(user_id, connection=connection)
+        await after_commit(
+            connection, partial(user_cache.write, user_id, user_cache.profile(user))
+        )
 
-    return await fetch_one(update_query)
+    return user
 
 
-async def all_users():
-    return await fetch_all(auth_user.select())
+async def create_users(users: list[NewUser]) -> list[dict[str, Any]]:
+    """
+    Create the users with one INSERT, emails already taken are skipped.
+    The passwords are hashed before a connection is checked out, the single
+    statement commits on its own.
+    """
+    passwords = await hash_passwords_async([user.password for user in users])
+    parameters = {
+        "emails": [user.email for user in users],
+        "passwords": passwords,
+        "is_admins": [user.is_admin for user in users],
+        "created_at": datetime.now(),
+    }
 
+    return await fetch_all(insert_users, None, parameters)
 
-async def delete_user(user_id: int) -> None:
-    user = await get_user_by_id(user_id)
-    if not user:
-        raise InvalidEmailError()
 
+async def set_users_role(
+    user_ids: list[int],
+    is_admin: bool,
+    *,
+    connection: AsyncConnection | None = None,
+) -> list[dict[str, Any]]:
+    parameters = {"ids": user_ids, "role": is_admin, "role_updated_at": datetime.now()}
+    users = await fetch_all(update_users_role, connection, parameters)
+    profiles = {user["id"]: user_cache.profile(user) for user in users}
+    await after_commit(connection, partial(user_cache.write_many, profiles))
+
+    return users
+
+
+async def delete_users(
+    user_ids: list[int], *, connection: AsyncConnection | None = None
+) -> list[int]:
+    deleted = await fetch_all(delete_users_by_id, connection, {"ids": user_ids})
+    deleted_ids = [user["id"] for user in deleted]
+    if deleted_ids:
+        await refresh_token_store.expire_users(deleted_ids, connection=connection)
+        await after_commit(
+            connection, partial(user_cache.write_many, dict.fromkeys(deleted_ids))
+        )
+
+    return deleted_ids
+
+
+async def get_users_page(
+    *,
+    after: int | None = None,
+    limit: int = auth_config.USERS_PAGE_SIZE,
+    connection: AsyncConnection | None = None,
+) -> list[dict[str, Any]]:
+    select_query = auth_user.select().order_by(auth_user.c.id).limit(limit)
+    if after is not None:
+        select_query = select_query.where(auth_user.c.id > after)
+
+    return await fetch_all(select_query, connection)
+
+
+def stream_users(*, after: int | None = None) -> AsyncGenerator[dict[str, Any], None]:
+    select_query = auth_user.select().order_by(auth_user.c.id)
+    if after is not None:
+        select_query = select_query.where(auth_user.c.id > after)
+
+    return stream_all(select_query, yield_per=auth_config.USERS_STREAM_YIELD_PER)
+
+
+async def delete_user(
+    user_id: int, *, connection: AsyncConnection | None = None
+) -> None:
     delete_query = auth_user.delete().where(auth_user.c.id == user_id)
 
-    await execute(delete_query)
+    if not await execute(delete_query, connection):
+        raise InvalidEmailError()
+    await expire_user_refresh_tokens(user_id, connection=connection)
+    await after_commit(connection, partial(user_cache.write, user_id, None))
+
 
+async def get_user_by_id(
+    user_id: int, *, connection: AsyncConnection | None = None
+) -> dict[str, Any] | None:
+    return await fetch_one(select_user_by_id, connection, {"user_id": user_id})
 
-async def get_user_by_id(user_id: int) -> dict[str, Any] | None:
-    select_query = auth_user.select().where(auth_user.c.id == user_id)
 
-    return await fetch_one(select_query)
+async def get_user_profile(
+    user_id: int, *, connection: AsyncConnection | None = None
+) -> dict[str, Any] | None:
+    """User without the password hash, served from the user cache"""
+    user = await user_cache.get(user_id)
+    if user is user_cache.MISSING:
+        user = user_cache.profile(await get_user_by_id(user_id, connection=connection))
+        # a miss may come from a lagging replica, only a delete caches None
+        if user is not None:
+            await user_cache.fill(user_id, user)
 
+    return user
 
-async def get_user_by_email(email: str) -> dict[str, Any] | None:
-    select_query = auth_user.select().where(auth_user.c.email == email)
 
-    return await fetch_one(select_query)
+async def get_user_by_email(
+    email: str, *, connection: AsyncConnection | None = None
+) -> dict[str, Any] | None:
+    return await fetch_one(select_user_by_email, connection, {"email": email.lower()})
 
 
 async def create_refresh_token(
-    *, user_id: int, refresh_token: str | None = None
+    *,
+    user_id: int,
+    refresh_token: str | None = None,
+    connection: AsyncConnection | None = None,
 ) -> str:
     if not refresh_token:
         refresh_token = get_token()
 
-    insert_query = refresh_tokens.insert().values(
-        uuid=uuid.uuid4(),
-        refresh_token=refresh_token,
-        expires_at=datetime.now() + timedelta(seconds=auth_config.REFRESH_TOKEN_EXP),
-        user_id=user_id,
-    )
-    await execute(insert_query)
+    await refresh_token_store.create(user_id, refresh_token, connection=connection)
 
     return refresh_token
 
 
-async def get_refresh_token(refresh_token: str) -> dict[str, Any] | None:
-    select_query = refresh_tokens.select().where(
-        refresh_tokens.c.refresh_token == refresh_token
-    )
-
-    return await fetch_one(select_query)
+async def get_refresh_token(
+    refresh_token: str, *, connection: AsyncConnection | None = None
+) -> dict[str, Any] | None:
+    return await refresh_token_store.get(refresh_token, connection=connection)
 
 
-async def expire_refresh_token(refresh_token_uuid: str) -> None:
-    update_query = (
-        refresh_tokens.update()
-        .values(expires_at=datetime.now() - timedelta(days=1))
-        .where(refresh_tokens.c.uuid == refresh_token_uuid)
+async def rotate_refresh_token(
+    refresh_token: dict[str, Any], *, connection: AsyncConnection | None = None
+) -> str:
+    new_refresh_token = get_token()
+    if not await refresh_token_store.rotate(
+        refresh_token, new_refresh_token, connection=connection
+    ):
+        raise RefreshTokenNotValidError()
+
+    return new_refresh_token
+
+
+async def expire_refresh_token(
+    refresh_token: dict[str, Any], *, connection: AsyncConnection | None = None
+) -> None:
+    await refresh_token_store.expire(refresh_token, connection=connection)
+
+
+async def expire_refresh_token_family(refresh_token: dict[str, Any]) -> None:
+    # own transaction, it must stay committed when the request fails right after
+    await refresh_token_store.expire_family(refresh_token)
+
+
+async def expire_user_refresh_tokens(
+    user_id: int, *, connection: AsyncConnection | None = None
+) -> None:
+    await refresh_token_store.expire_user(user_id, connection=connection)
+
+
+async def purge_expired_refresh_tokens(
+    *,
+    retention: timedelta = timedelta(seconds=auth_config.REFRESH_TOKEN_PURGE_RETENTION),
+    batch_size: int = auth_config.REFRESH_TOKEN_PURGE_BATCH_SIZE,
+    pause: float = auth_config.REFRESH_TOKEN_PURGE_PAUSE,
+) -> tuple[int, float]:
+    """
+    Delete refresh tokens expired for longer than retention, batch by batch so
+    every statement locks a few rows only. Returns rows removed and seconds taken.
+    """
+    started = time.monotonic()
+    expired = (
+        select(refresh_tokens.c.uuid)
+        .where(refresh_tokens.c.expires_at < datetime.now() - retention)
+        .limit(batch_size)
+    )
+    delete_query = refresh_tokens.delete().where(
+        refresh_tokens.c.uuid.in_(expired.scalar_subquery())
     )
 
-    await execute(update_query)
-
-
-async def authenticate_user(auth_data: AuthUser) -> dict[str, Any]:
-    user = await get_user_by_email(auth_data.email)
+    deleted = 0
+    while True:
+        batch = await execute(delete_query)
+        deleted += batch
+        if batch < batch_size:
+            return deleted, time.monotonic() - started
+        await asyncio.sleep(pause)
+
+
+async def purge_refresh_tokens_periodically() -> None:
+    """Run the purge every interval, on one worker only"""
+    interval = auth_config.REFRESH_TOKEN_PURGE_INTERVAL
+    while interval:
+        await asyncio.sleep(interval)
+        try:
+            # not released, other workers skip the purge until the lock expires
+            if not await get_lock("auth:refresh-token-purge", interval).acquire():
+                continue
+            deleted, elapsed = await purge_expired_refresh_tokens()
+            logger.info("Purged %d refresh tokens in %.2fs", deleted, elapsed)
+        except (RedisError, SQLAlchemyError) as er:
+            logger.error("Refresh token purge failed: %s", er)
+
+
+async def authenticate_user(
+    auth_data: AuthUser, *, connection: AsyncConnection | None = None
+) -> dict[str, Any]:
+    # a replica may not have the account just registered or the new password yet
+    read_from_primary()
+    user = await get_user_by_email(auth_data.email, connection=connection)
     if not user:
         raise InvalidCredentialsError()
 
-    if not check_password(auth_data.password, user["password"]):
+    if not await check_password_async(auth_data.password, user["password"]):
         raise InvalidCredentialsError()
 
     return user
@@ -0,0 +1,437 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from asyncio import Task
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Any, Coroutine
+
+from fastapi.logger import logger
+from redis.commands.core import AsyncScript
+from sqlalchemy import bindparam
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src import redis
+from src.auth.config import auth_config
+from src.auth.utils import hash_token
+from src.database import execute, fetch_one, refresh_tokens
+
+# Mark the old token rotated and store the new one, if the old token wasn't
+# rotated yet, so it can't be used twice by concurrent requests. The rotated
+# token is kept until it expires to detect reuse. Expired tokens are gone by TTL.
+ROTATE_SCRIPT = """
+local old = redis.call('HMGET', KEYS[1], 'user_id', 'rotated_at')
+if old[1] ~= ARGV[1] or old[2] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'rotated_at', ARGV[6])
+redis.call('SREM', KEYS[3], KEYS[1])
+redis.call(
+    'HSET', KEYS[2],
+    'uuid', ARGV[2], 'user_id', ARGV[1], 'expires_at', ARGV[3], 'family_id', ARGV[5]
+)
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+redis.call('SADD', KEYS[3], KEYS[2])
+redis.call('EXPIRE', KEYS[3], ARGV[4])
+redis.call('SET', KEYS[4], KEYS[2], 'EX', ARGV[4])
+return 1
+"""
+
+select_refresh_token = refresh_tokens.select().where(
+    refresh_tokens.c.token_hash == bindparam("token_hash")
+)
+
+
+def _new_refresh_token(
+    user_id: int, refresh_token: str, family_id: uuid.UUID | None = None
+) -> dict[str, Any]:
+    token_uuid = uuid.uuid4()
+    return {
+        "uuid": token_uuid,
+        "user_id": user_id,
+        "token_hash": hash_token(refresh_token),
+        # a new sign-in starts a family, rotated tokens inherit it
+        "family_id": family_id or token_uuid,
+        "expires_at": datetime.now() + timedelta(seconds=auth_config.REFRESH_TOKEN_EXP),
+    }
+
+
+class RefreshTokenStore(ABC):
+    """
+    Refresh tokens as dicts of uuid, user_id, token_hash, family_id, expires_at
+    and rotated_at. Only the sha256 digest of a token is stored. The connection
+    is used by the postgres store to run in the request transaction.
+    """
+
+    @abstractmethod
+    async def create(
+        self,
+        user_id: int,
+        refresh_token: str,
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> dict[str, Any]: ...
+
+    @abstractmethod
+    async def get(
+        self, refresh_token: str, *, connection: AsyncConnection | None = None
+    ) -> dict[str, Any] | None: ...
+
+    @abstractmethod
+    async def rotate(
+        self,
+        refresh_token: dict[str, Any],
+        new_refresh_token: str,
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> dict[str, Any] | None:
+        """Replace a valid token by a new one, None if it was used already."""
+
+    @abstractmethod
+    async def expire(
+        self,
+        refresh_token: dict[str, Any],
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> None: ...
+
+    @abstractmethod
+    async def expire_family(
+        self,
+        refresh_token: dict[str, Any],
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> None: ...
+
+    @abstractmethod
+    async def expire_user(
+        self, user_id: int, *, connection: AsyncConnection | None = None
+    ) -> None: ...
+
+    async def expire_users(
+        self, user_ids: list[int], *, connection: AsyncConnection | None = None
+    ) -> None:
+        for user_id in user_ids:
+            await self.expire_user(user_id, connection=connection)
+
+
+class PostgresRefreshTokenStore(RefreshTokenStore):
+    async def add(
+        self, token: dict[str, Any], *, connection: AsyncConnection | None = None
+    ) -> None:
+        await execute(refresh_tokens.insert().values(**token), connection)
+
+    async def mark_rotated(
+        self,
+        refresh_token: dict[str, Any],
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> bool:
+        update_query = (
+            refresh_tokens.update()
+            .values(
+                expires_at=datetime.now() - timedelta(days=1),
+                rotated_at=datetime.now(),
+            )
+            .where(
+                refresh_tokens.c.uuid == refresh_token["uuid"],
+                refresh_tokens.c.rotated_at.is_(None),
+                refresh_tokens.c.expires_at >= datetime.now(),
+            )
+            .returning(refresh_tokens.c.uuid)
+        )
+
+        return await fetch_one(update_query, connection) is not None
+
+    async def create(
+        self,
+        user_id: int,
+        refresh_token: str,
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> dict[str, Any]:
+        token = _new_refresh_token(user_id, refresh_token)
+        await self.add(token, connection=connection)
+        return token
+
+    async def get(
+        self, refresh_token: str, *, connection: AsyncConnection | None = None
+    ) -> dict[str, Any] | None:
+        return await fetch_one(
+            select_refresh_token, connection, {"token_hash": hash_token(refresh_token)}
+        )
+
+    async def rotate(
+        self,
+        refresh_token: dict[str, Any],
+        new_refresh_token: str,
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> dict[str, Any] | None:
+        if not await self.mark_rotated(refresh_token, connection=connection):
+            return None
+
+        token = _new_refresh_token(
+            refresh_token["user_id"], new_refresh_token, refresh_token["family_id"]
+        )
+        await self.add(token, connection=connection)
+        return token
+
+    async def expire(
+        self,
+        refresh_token: dict[str, Any],
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> None:
+        update_query = (
+            refresh_tokens.update()
+            .values(expires_at=datetime.now() - timedelta(days=1))
+            .where(refresh_tokens.c.uuid == refresh_token["uuid"])
+        )
+
+        await execute(update_query, connection)
+
+    async def expire_family(
+        self,
+        refresh_token: dict[str, Any],
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> None:
+        update_query = (
+            refresh_tokens.update()
+            .values(expires_at=datetime.now() - timedelta(days=1))
+            .where(
+                refresh_tokens.c.family_id == refresh_token["family_id"],
+                refresh_tokens.c.expires_at >= datetime.now(),
+            )
+        )
+
+        await execute(update_query, connection)
+
+    async def expire_user(
+        self, user_id: int, *, connection: AsyncConnection | None = None
+    ) -> None:
+        update_query = (
+            refresh_tokens.update()
+            .values(expires_at=datetime.now() - timedelta(days=1))
+            .where(
+                refresh_tokens.c.user_id == user_id,
+                refresh_tokens.c.expires_at >= datetime.now(),
+            )
+        )
+
+        await execute(update_query, connection)
+
+    async def expire_users(
+        self, user_ids: list[int], *, connection: AsyncConnection | None = None
+    ) -> None:
+        update_query = (
+            refresh_tokens.update()
+            .values(expires_at=datetime.now() - timedelta(days=1))
+            .where(
+                refresh_tokens.c.user_id.in_(user_ids),
+                refresh_tokens.c.expires_at >= datetime.now(),
+            )
+        )
+
+        await execute(update_query, connection)
+
+
+class RedisRefreshTokenStore(RefreshTokenStore):
+    """
+    Tokens are redis hashes expiring with the token, every user has a set of
+    their token keys and every family points to its current token. With an
+    audit store the changes are also written there in the background, the
+    audit store is never read.
+    """
+
+    def __init__(self, audit: PostgresRefreshTokenStore | None = None):
+        self.audit = audit
+        self._script: AsyncScript | None = None
+        self._audit_tasks: set[Task] = set()
+
+    @staticmethod
+    def token_key(token_hash: str) -> str:
+        return f"{auth_config.REFRESH_TOKEN_KEY_PREFIX}:token:{token_hash}"
+
+    @staticmethod
+    def sessions_key(user_id: int) -> str:
+        return f"{auth_config.REFRESH_TOKEN_KEY_PREFIX}:sessions:{user_id}"
+
+    @staticmethod
+    def family_key(family_id: uuid.UUID) -> str:
+        return f"{auth_config.REFRESH_TOKEN_KEY_PREFIX}:family:{family_id}"
+
+    def _audit(self, coro: Coroutine[Any, Any, Any]) -> None:
+        task = asyncio.create_task(coro)
+        self._audit_tasks.add(task)
+        task.add_done_callback(self._audit_done)
+
+    def _audit_done(self, task: Task) -> None:
+        self._audit_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("Refresh token audit failed: %s", task.exception())
+
+    async def _audit_rotate(
+        self, refresh_token: dict[str, Any], token: dict[str, Any]
+    ) -> None:
+        await self.audit.mark_rotated(refresh_token)
+        await self.audit.add(token)
+
+    async def create(
+        self,
+        user_id: int,
+        refresh_token: str,
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> dict[str, Any]:
+        token = _new_refresh_token(user_id, refresh_token)
+        token_key = self.token_key(token["token_hash"])
+        sessions_key = self.sessions_key(user_id)
+
+        async with redis.redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                token_key,
+                mapping={
+                    "uuid": str(token["uuid"]),
+                    "user_id": user_id,
+                    "expires_at": token["expires_at"].isoformat(),
+                    "family_id": str(token["family_id"]),
+                },
+            )
+            pipe.expire(token_key, auth_config.REFRESH_TOKEN_EXP)
+            pipe.sadd(sessions_key, token_key)
+            pipe.expire(sessions_key, auth_config.REFRESH_TOKEN_EXP)
+            pipe.set(
+                self.family_key(token["family_id"]),
+                token_key,
+                ex=auth_config.REFRESH_TOKEN_EXP,
+            )
+            await pipe.execute()
+
+        if self.audit:
+            self._audit(self.audit.add(token))
+        return token
+
+    async def get(
+        self, refresh_token: str, *, connection: AsyncConnection | None = None
+    ) -> dict[str, Any] | None:
+        token_hash = hash_token(refresh_token)
+        data = await redis.redis_client.hgetall(self.token_key(token_hash))
+        if not data:
+            return None
+
+        rotated_at = data.get("rotated_at")
+        return {
+            "uuid": uuid.UUID(data["uuid"]),
+            "user_id": int(data["user_id"]),
+            "token_hash": token_hash,
+            "family_id": uuid.UUID(data["family_id"]),
+            "expires_at": datetime.fromisoformat(data["expires_at"]),
+            "rotated_at": datetime.fromisoformat(rotated_at) if rotated_at else None,
+        }
+
+    async def rotate(
+        self,
+        refresh_token: dict[str, Any],
+        new_refresh_token: str,
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> dict[str, Any] | None:
+        if self._script is None:
+            self._script = redis.register_script(ROTATE_SCRIPT)
+
+        user_id = refresh_token["user_id"]
+        token = _new_refresh_token(
+            user_id, new_refresh_token, refresh_token["family_id"]
+        )
+        rotated = await self._script(
+            keys=[
+                self.token_key(refresh_token["token_hash"]),
+                self.token_key(token["token_hash"]),
+                self.sessions_key(user_id),
+                self.family_key(token["family_id"]),
+            ],
+            args=[
+                user_id,
+                str(token["uuid"]),
+                token["expires_at"].isoformat(),
+                auth_config.REFRESH_TOKEN_EXP,
+                str(token["family_id"]),
+                datetime.now().isoformat(),
+            ],
+        )
+        if not rotated:
+            return None
+
+        if self.audit:
+            self._audit(self._audit_rotate(refresh_token, token))
+        return token
+
+    async def expire(
+        self,
+        refresh_token: dict[str, Any],
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> None:
+        token_key = self.token_key(refresh_token["token_hash"])
+        async with redis.redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(token_key)
+            pipe.srem(self.sessions_key(refresh_token["user_id"]), token_key)
+            await pipe.execute()
+
+        if self.audit:
+            self._audit(self.audit.expire(refresh_token))
+
+    async def expire_family(
+        self,
+        refresh_token: dict[str, Any],
+        *,
+        connection: AsyncConnection | None = None,
+    ) -> None:
+        family_key = self.family_key(refresh_token["family_id"])
+        token_key = await redis.redis_client.get(family_key)
+        async with redis.redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(family_key)
+            if token_key:
+                pipe.delete(token_key)
+                pipe.srem(self.sessions_key(refresh_token["user_id"]), token_key)
+            await pipe.execute()
+
+        if self.audit:
+            self._audit(self.audit.expire_family(refresh_token))
+
+    async def expire_user(
+        self, user_id: int, *, connection: AsyncConnection | None = None
+    ) -> None:
+        sessions_key = self.sessions_key(user_id)
+        token_keys = await redis.redis_client.smembers(sessions_key)
+        await redis.redis_client.delete(sessions_key, *token_keys)
+
+        if self.audit:
+            self._audit(self.audit.expire_user(user_id))
+
+    async def expire_users(
+        self, user_ids: list[int], *, connection: AsyncConnection | None = None
+    ) -> None:
+        sessions_keys = [self.sessions_key(user_id) for user_id in user_ids]
+        async with redis.redis_client.pipeline(transaction=False) as pipe:
+            for sessions_key in sessions_keys:
+                await pipe.smembers(sessions_key)
+            token_keys = await pipe.execute()
+        await redis.redis_client.delete(
+            *sessions_keys, *chain.from_iterable(token_keys)
+        )
+
+        if self.audit:
+            self._audit(self.audit.expire_users(user_ids))
+
+
+def create_refresh_token_store() -> RefreshTokenStore:
+    if auth_config.REFRESH_TOKEN_BACKEND == "redis":
+        audit = PostgresRefreshTokenStore() if auth_config.REFRESH_TOKEN_AUDIT else None
+        return RedisRefreshTokenStore(audit=audit)
+    return PostgresRefreshTokenStore()
+
+
+refresh_token_store = create_refresh_token_store()
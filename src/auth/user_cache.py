@@ -0,0 +1,102 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Any
+
+import msgpack
+from fastapi.logger import logger
+from redis.exceptions import RedisError
+
+from src import redis
+from src.auth.config import auth_config
+from src.database import auth_user
+
+# the password hash is never cached, a profile is enough for /users/me and tokens
+USER_FIELDS = tuple(
+    column.name for column in auth_user.columns if column.name != "password"
+)
+# entries are packed by position, a new column layout gets new keys
+CACHE_VERSION = hashlib.blake2s(
+    ",".join(f"{column.name}:{column.type}" for column in auth_user.columns).encode(),
+    digest_size=4,
+).hexdigest()
+
+MISSING = object()
+
+
+def _key(user_id: int) -> str:
+    return f"{auth_config.USER_CACHE_KEY_PREFIX}:{CACHE_VERSION}:{user_id}"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # the columns hold naive UTC times, msgpack timestamps must be aware
+        return msgpack.Timestamp.from_datetime(value.replace(tzinfo=timezone.utc))
+    raise TypeError(f"Can't pack {type(value)}")
+
+
+def dumps(user: dict[str, Any] | None) -> bytes:
+    """Pack the profile fields as an array, None marks a deleted user"""
+    if user is None:
+        return msgpack.packb(None)
+    return msgpack.packb([user[field] for field in USER_FIELDS], default=_default)
+
+
+def loads(raw: bytes) -> dict[str, Any] | None:
+    values = msgpack.unpackb(raw, timestamp=3)
+    if values is None:
+        return None
+    return {
+        field: value.replace(tzinfo=None) if isinstance(value, datetime) else value
+        for field, value in zip(USER_FIELDS, values, strict=True)
+    }
+
+
+def profile(user: dict[str, Any] | None) -> dict[str, Any] | None:
+    return {field: user[field] for field in USER_FIELDS} if user else None
+
+
+async def get(user_id: int) -> dict[str, Any] | None | object:
+    """Cached profile, None for a deleted user and MISSING if not cached"""
+    try:
+        raw = await redis.redis_binary_client.get(_key(user_id))
+    except RedisError as er:
+        logger.error("Redis error %s:", er)
+        return MISSING
+
+    return MISSING if raw is None else loads(raw)
+
+
+async def fill(user_id: int, user: dict[str, Any]) -> None:
+    """
+    Cache a profile read from the database. NX keeps a write-through value
+    set while the read was in flight, the read may be older than it.
+    """
+    try:
+        await redis.redis_binary_client.set(
+            _key(user_id), dumps(user), ex=auth_config.USER_CACHE_TTL, nx=True
+        )
+    except RedisError as er:
+        logger.error("Redis error %s:", er)
+
+
+async def write_many(users: dict[int, dict[str, Any] | None]) -> None:
+    """Same as write for several users, with one pipeline"""
+    try:
+        async with redis.redis_binary_client.pipeline(transaction=False) as pipe:
+            for user_id, user in users.items():
+                await pipe.set(
+                    _key(user_id), dumps(user), ex=auth_config.USER_CACHE_TTL
+                )
+            await pipe.execute()
+    except RedisError as er:
+        logger.error("Redis error %s:", er)
+
+
+async def write(user_id: int, user: dict[str, Any] | None) -> None:
+    """Replace the cached profile after the user changed, None after a delete"""
+    try:
+        await redis.redis_binary_client.set(
+            _key(user_id), dumps(user), ex=auth_config.USER_CACHE_TTL
+        )
+    except RedisError as er:
+        logger.error("Redis error %s:", er)
@@ -1,3 +1,4 @@
+import hashlib
 import secrets
 from typing import Any
 
@@ -28,3 +29,7 @@ def get_refresh_token_settings(
 
 def get_token() -> str:
     return secrets.token_hex(settings.TOKEN_SIZE)
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
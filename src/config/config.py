@@ -12,6 +12,7 @@ class SqlAlchemyConfig:
     __test__ = False
 
     DATABASE_URL: str = None
+    REPLICA_URLS: list[str] = []
     ECHO: bool = False
     ENGINE_OPTIONS: dict[str, Any] = {}
 
@@ -37,6 +38,10 @@ class SqlAlchemyConfig:
             cfg[f"sqlalchemy.{k}"] = v
         return cfg
 
+    @property
+    def replica_configs(self) -> list[dict[str, Any]]:
+        return [{**self.config, "sqlalchemy.url": url} for url in self.REPLICA_URLS]
+
 
 class PostgreSQL(SqlAlchemyConfig):
     """Uses for PostgresSQL database server."""
@@ -45,15 +50,27 @@ class PostgreSQL(SqlAlchemyConfig):
     ENGINE_OPTIONS: dict[str, Any] = {
         "pool_size": 10,
         "pool_pre_ping": True,
+        # compiled statements shared by all connections, prepared statements
+        # kept per asyncpg connection. Set the latter to 0 behind pgbouncer
+        # in transaction mode, it can't keep statements prepared.
+        "query_cache_size": 1200,
+        "connect_args": {"prepared_statement_cache_size": 500},
     }
 
-    def __init__(self, url):
+    def __init__(self, url, replica_urls=()):
         self.DATABASE_URL = url
+        self.REPLICA_URLS = list(replica_urls)
 
 
 class BaseConfig(CustomSettings):
     REDIS_URL: RedisDsn
     DATABASE_URL: PostgresDsn
+    # read-only Selects are spread over the replicas, writes go to DATABASE_URL
+    DATABASE_REPLICA_URLS: list[PostgresDsn] = []
+    # seconds a user keeps reading the primary after a write
+    DATABASE_REPLICA_STICKINESS: int = 5
+    DATABASE_REPLICA_CHECK_INTERVAL: float = 10
+    DATABASE_REPLICA_MAX_LAG: float = 5  # seconds behind the primary
     WEATHER_SERVICE_APIKEY: str
     CORS_HEADERS: list[str]
     CORS_ORIGINS: list[str]
@@ -18,6 +18,7 @@ class ErrorMessage:
     BAD_REQUEST = "Bad Request"
     EXTERNAL_ERROR = "External error, try later"
     AUTHENTICATION_ERROR = "User not authenticated"
+    SERVICE_UNAVAILABLE = "Service temporarily unavailable, try later"
 
 
 class Environment(str, Enum):
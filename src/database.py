@@ -1,5 +1,11 @@
-from typing import Any
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Awaitable, Callable
 
+from fastapi.logger import logger
+from redis.exceptions import RedisError
 from sqlalchemy import (
     Boolean,
     Column,
@@ -8,6 +14,7 @@ from sqlalchemy import (
     Delete,
     ForeignKey,
     Identity,
+    Index,
     Insert,
     Integer,
     MetaData,
@@ -16,10 +23,17 @@ from sqlalchemy import (
     Table,
     Update,
     func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.ext.asyncio import async_engine_from_config
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    async_engine_from_config,
+)
 
+from src import redis
 from src.settings import db_settings, settings
 
 DB_NAMING_CONVENTION = {
@@ -33,6 +47,21 @@ DB_NAMING_CONVENTION = {
 DATABASE_URL = str(settings.DATABASE_URL)
 
 engine = async_engine_from_config(db_settings.config)
+replica_engines = [async_engine_from_config(cfg) for cfg in db_settings.replica_configs]
+unhealthy_replicas: set[AsyncEngine] = set()
+
+# user the current request reads and writes for, and whether it reads the primary
+_request_user: ContextVar[int | None] = ContextVar("request_user", default=None)
+_read_primary: ContextVar[bool] = ContextVar("read_primary", default=False)
+# callbacks to run once the request transaction of the connection is committed
+_after_commit: dict[AsyncConnection, list[Callable[[], Awaitable[Any]]]] = {}
+
+# 0 while the replica has replayed everything it received, an idle primary
+# doesn't make it look behind
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
 metadata = MetaData(naming_convention=DB_NAMING_CONVENTION)
 
 auth_user: Table = Table(
@@ -46,38 +75,223 @@ auth_user: Table = Table(
     Column("updated_at", DateTime, onupdate=func.now()),
     Column("time_at", DateTime, onupdate=func.now()),
 )
+Index("ix_auth_user_email_lower", func.lower(auth_user.c.email), unique=True)
 
 refresh_tokens: Table = Table(
     "auth_refresh_token",
     metadata,
     Column("uuid", UUID, primary_key=True),
     Column("user_id", ForeignKey("auth_user.id", ondelete="CASCADE"), nullable=False),
-    Column("refresh_token", String, nullable=False),
-    Column("expires_at", DateTime, nullable=False),
+    Column("token_hash", String, nullable=False, index=True, unique=True),
+    Column("family_id", UUID, nullable=False, index=True),
+    Column("expires_at", DateTime, nullable=False, index=True),
+    Column("rotated_at", DateTime),
     Column("created_at", DateTime, server_default=func.now(), nullable=False),
     Column("updated_at", DateTime, onupdate=func.now()),
 )
 
 
-async def fetch_one(select_query: Select | Insert | Update) -> dict[str, Any] | None:
+@asynccontextmanager
+async def begin() -> AsyncGenerator[AsyncConnection, None]:
+    """
+    One pooled connection and transaction, committed when the block exits and
+    rolled back when it raises. Callbacks registered with after_commit run
+    once it is committed.
+    """
+    callbacks: list[Callable[[], Awaitable[Any]]] = []
     async with engine.begin() as conn:
-        cursor: CursorResult = await conn.execute(select_query)
+        _after_commit[conn] = callbacks
+        try:
+            yield conn
+        finally:
+            del _after_commit[conn]
+
+    for callback in callbacks:
+        await callback()
+
+
+async def get_connection() -> AsyncGenerator[AsyncConnection, None]:
+    """
+    One pooled connection and transaction per request, committed before the
+    response is sent and rolled back when the endpoint raises.
+    """
+    async with begin() as conn:
+        yield conn
+
+
+async def after_commit(
+    connection: AsyncConnection | None, callback: Callable[[], Awaitable[Any]]
+) -> None:
+    """
+    Run the callback once the transaction of the connection opened by begin
+    is committed, never after a rollback. Without a request transaction the
+    statements are committed already and the callback runs at once.
+    """
+    callbacks = _after_commit.get(connection) if connection is not None else None
+    if callbacks is None:
+        await callback()
+    else:
+        callbacks.append(callback)
+
+
+def set_request_user(user_id: int) -> None:
+    """Writes of the current request make the user read the primary for a while"""
+    _request_user.set(user_id)
+
+
+def read_from_primary() -> None:
+    """Send the remaining reads of the current request to the primary"""
+    _read_primary.set(True)
+
+
+def _sticky_key(user_id: int) -> str:
+    return f"db:read-primary:{user_id}"
+
+
+def _is_read_only(query: Any) -> bool:
+    # SELECT ... FOR UPDATE takes locks, only the primary can serve it
+    return isinstance(query, Select) and query._for_update_arg is None
+
+
+async def _stick_to_primary() -> None:
+    user_id = _request_user.get()
+    if not replica_engines or user_id is None:
+        return
+
+    _read_primary.set(True)
+    try:
+        await redis.redis_client.set(
+            _sticky_key(user_id), 1, ex=settings.DATABASE_REPLICA_STICKINESS
+        )
+    except RedisError as er:
+        logger.warning("Can't keep user %s on the primary: %s", user_id, er)
+
+
+async def _read_engine() -> AsyncEngine:
+    replicas = [e for e in replica_engines if e not in unhealthy_replicas]
+    if not replicas or _read_primary.get():
+        return engine
+
+    user_id = _request_user.get()
+    if user_id is not None:
+        try:
+            sticky = await redis.redis_client.exists(_sticky_key(user_id))
+        except RedisError:
+            sticky = True
+        if sticky:
+            _read_primary.set(True)
+            return engine
+
+    return random.choice(replicas)
+
+
+async def _connect_for_read() -> AsyncConnection:
+    read_engine = await _read_engine()
+    if read_engine is not engine:
+        try:
+            return await read_engine.connect()
+        except (OSError, SQLAlchemyError) as er:
+            # back in rotation once a health check passes
+            logger.warning("Replica %s is down: %s", read_engine.url, er)
+            unhealthy_replicas.add(read_engine)
+
+    return await engine.connect()
+
+
+@asynccontextmanager
+async def _transaction(
+    connection: AsyncConnection | None, *, read_only: bool = False
+) -> AsyncGenerator[AsyncConnection, None]:
+    if connection is not None:
+        yield connection
+    elif read_only:
+        conn = await _connect_for_read()
+        try:
+            yield conn
+        finally:
+            await conn.close()
+    else:
+        async with engine.begin() as conn:
+            yield conn
+
+    if not read_only:
+        await _stick_to_primary()
+
+
+async def fetch_one(
+    select_query: Select | Insert | Update,
+    connection: AsyncConnection | None = None,
+    parameters: dict[str, Any] | None = None,
+) -> dict[str, Any] | None:
+    async with _transaction(connection, read_only=_is_read_only(select_query)) as conn:
+        cursor: CursorResult = await conn.execute(select_query, parameters)
         result = cursor.first()
         return result._asdict() if result else None
 
 
-async def fetch_all(select_query: Select | Insert | Update) -> list[dict[str, Any]]:
-    async with engine.begin() as conn:
-        cursor: CursorResult = await conn.execute(select_query)
+async def fetch_all(
+    select_query: Select | Insert | Update | Delete,
+    connection: AsyncConnection | None = None,
+    parameters: dict[str, Any] | None = None,
+) -> list[dict[str, Any]]:
+    async with _transaction(connection, read_only=_is_read_only(select_query)) as conn:
+        cursor: CursorResult = await conn.execute(select_query, parameters)
         return [r._asdict() for r in cursor.all()]
 
 
-async def execute(select_query: Insert | Update | Delete) -> None:
-    async with engine.begin() as conn:
-        await conn.execute(select_query)
+async def execute(
+    select_query: Insert | Update | Delete,
+    connection: AsyncConnection | None = None,
+    parameters: dict[str, Any] | None = None,
+) -> int:
+    async with _transaction(connection) as conn:
+        cursor: CursorResult = await conn.execute(select_query, parameters)
+        return cursor.rowcount
 
 
-async def fetch_scalar(select_query: Select) -> Any:
-    async with engine.begin() as conn:
-        cursor: CursorResult = await conn.execute(select_query)
+async def fetch_scalar(
+    select_query: Select,
+    connection: AsyncConnection | None = None,
+    parameters: dict[str, Any] | None = None,
+) -> Any:
+    async with _transaction(connection, read_only=_is_read_only(select_query)) as conn:
+        cursor: CursorResult = await conn.execute(select_query, parameters)
         return cursor.scalar()
+
+
+async def stream_all(
+    select_query: Select, *, yield_per: int
+) -> AsyncGenerator[dict[str, Any], None]:
+    """
+    Rows of a server-side cursor, only yield_per rows are held at once. Runs on
+    its own connection, a streamed response outlives the request dependencies.
+    """
+    async with _transaction(None, read_only=True) as conn:
+        result = await conn.stream(select_query.execution_options(yield_per=yield_per))
+        async for row in result:
+            yield row._asdict()
+
+
+async def check_replicas() -> None:
+    """Take replicas that are down or lag behind out of rotation, until they recover"""
+    for replica in replica_engines:
+        try:
+            async with asyncio.timeout(settings.DATABASE_REPLICA_CHECK_INTERVAL):
+                async with replica.connect() as conn:
+                    lag = await conn.scalar(REPLICA_LAG_QUERY)
+        except (OSError, TimeoutError, SQLAlchemyError) as er:
+            logger.warning("Replica %s is down: %s", replica.url, er)
+            unhealthy_replicas.add(replica)
+            continue
+
+        if lag is not None and lag > settings.DATABASE_REPLICA_MAX_LAG:
+            logger.warning("Replica %s lags %.1fs behind", replica.url, lag)
+            unhealthy_replicas.add(replica)
+        else:
+            unhealthy_replicas.discard(replica)
+
+
+async def check_replicas_periodically() -> None:
+    while replica_engines:
+        await check_replicas()
+        await asyncio.sleep(settings.DATABASE_REPLICA_CHECK_INTERVAL)
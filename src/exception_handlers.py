@@ -1,9 +1,9 @@
 from fastapi import FastAPI
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
 from starlette import status
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
 from src.auth.exceptions import (
     AuthorizationFailedError,
@@ -15,11 +15,19 @@ from src.auth.exceptions import (
     InvalidTokenError,
     InvalidUserIDError,
     NotAuthenticatedError,
+    PasswordHasherBusyError,
     RefreshTokenNotFoundError,
     RefreshTokenNotValidError,
 )
 from src.exceptions import ErrorItem, ErrorResponse
-from src.weather_service.exceptions import InvalidResponseError, InvalidSearchError
+from src.responses import ModelResponse
+from src.weather_service.exceptions import (
+    InvalidResponseError,
+    InvalidSearchError,
+    UpstreamRateLimitedError,
+    UpstreamTimeoutError,
+    UpstreamUnavailableError,
+)
 from src.weather_service.exceptions import (
     InvalidTokenError as WeatherServiceInvalidToken,
 )
@@ -33,11 +41,11 @@ async def email_taken_exception_handler(
         error_code=exception.error_code,
         error_message=exception.error_message,
     )
-    return JSONResponse(
+    return ModelResponse(
+        ErrorResponse(error=error),
         status_code=status.HTTP_400_BAD_REQUEST,
-        content=jsonable_encoder(
-            ErrorResponse(error=error), exclude_none=True, exclude_unset=True
-        ),
+        exclude_none=True,
+        exclude_unset=True,
     )
 
 
@@ -48,11 +56,11 @@ async def authorization_failed_exception_handler(
         error_code=exception.error_code,
         error_message=exception.error_message,
     )
-    return JSONResponse(
+    return ModelResponse(
+        ErrorResponse(error=error),
         status_code=status.HTTP_403_FORBIDDEN,
-        content=jsonable_encoder(
-            ErrorResponse(error=error), exclude_none=True, exclude_unset=True
-        ),
+        exclude_none=True,
+        exclude_unset=True,
     )
 
 
@@ -71,11 +79,11 @@ async def auth_failed_exception_handler(
         error_code=exception.error_code,
         error_message=exception.error_message,
     )
-    return JSONResponse(
+    return ModelResponse(
+        ErrorResponse(error=error),
         status_code=status.HTTP_401_UNAUTHORIZED,
-        content=jsonable_encoder(
-            ErrorResponse(error=error), exclude_none=True, exclude_unset=True
-        ),
+        exclude_none=True,
+        exclude_unset=True,
         headers={"WWW-Authenticate": "Bearer"},
     )
 
@@ -90,11 +98,11 @@ async def weather_auth_failed_exception_handler(
         error_code=exception.error_code,
         error_message=exception.error_message,
     )
-    return JSONResponse(
+    return ModelResponse(
+        ErrorResponse(error=error),
         status_code=status.HTTP_401_UNAUTHORIZED,
-        content=jsonable_encoder(
-            ErrorResponse(error=error), exclude_none=True, exclude_unset=True
-        ),
+        exclude_none=True,
+        exclude_unset=True,
     )
 
 
@@ -105,18 +113,54 @@ async def remote_server_bad_response_failed_exception_handler(
         error_code=exception.error_code,
         error_message=exception.error_message,
     )
-    return JSONResponse(
+    return ModelResponse(
+        ErrorResponse(error=error),
         status_code=status.HTTP_400_BAD_REQUEST,
-        content=jsonable_encoder(
-            ErrorResponse(error=error), exclude_none=True, exclude_unset=True
-        ),
+        exclude_none=True,
+        exclude_unset=True,
+    )
+
+
+async def remote_server_timeout_exception_handler(
+    request: Request, exception: [UpstreamTimeoutError]
+):
+    error = ErrorItem(
+        error_code=exception.error_code,
+        error_message=exception.error_message,
+    )
+    return ModelResponse(
+        ErrorResponse(error=error),
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        exclude_none=True,
+        exclude_unset=True,
+    )
+
+
+async def service_unavailable_exception_handler(
+    request: Request,
+    exception: [
+        PasswordHasherBusyError,
+        UpstreamUnavailableError,
+        UpstreamRateLimitedError,
+    ],
+):
+    error = ErrorItem(
+        error_code=exception.error_code,
+        error_message=exception.error_message,
+    )
+    return ModelResponse(
+        ErrorResponse(error=error),
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        exclude_none=True,
+        exclude_unset=True,
+        headers={"Retry-After": "1"},
     )
 
 
 async def request_validation_exception_handler(
     request: Request, exception: [RequestValidationError]
 ):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content=jsonable_encoder(
             {"detail": exception.errors(), "body": exception.body}
@@ -127,7 +171,7 @@ async def request_validation_exception_handler(
 async def form_validation_exception_handler(
     request: Request, exception: [FormValidationError]
 ):
-    return JSONResponse(
+    return ORJSONResponse(
         {"error": exception.error_detail}, status_code=status.HTTP_401_UNAUTHORIZED
     )
 
@@ -158,3 +202,15 @@ def register_error_handlers(app: FastAPI) -> None:
     app.add_exception_handler(
         WeatherServiceInvalidToken, weather_auth_failed_exception_handler
     )
+    app.add_exception_handler(
+        UpstreamTimeoutError, remote_server_timeout_exception_handler
+    )
+    app.add_exception_handler(
+        PasswordHasherBusyError, service_unavailable_exception_handler
+    )
+    app.add_exception_handler(
+        UpstreamUnavailableError, service_unavailable_exception_handler
+    )
+    app.add_exception_handler(
+        UpstreamRateLimitedError, service_unavailable_exception_handler
+    )
@@ -42,3 +42,7 @@ class ExternalError(DetailedError):
 
 class NotAuthenticatedError(DetailedError):
     error_message = ErrorMessage.AUTHENTICATION_ERROR
+
+
+class ServiceUnavailableError(DetailedError):
+    error_message = ErrorMessage.SERVICE_UNAVAILABLE
@@ -1,16 +1,23 @@
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 import redis.asyncio as aioredis
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.cors import CORSMiddleware
 
-from src import redis
+from src import database, redis
+from src.auth import keys
 from src.auth.router import router as auth_router
+from src.auth.security import shutdown_hasher_pool
+from src.auth.service import purge_refresh_tokens_periodically
 from src.constants import Tags
 from src.exception_handlers import register_error_handlers
 from src.settings import app_configs, settings
+from src.weather_service import cache as weather_cache
+from src.weather_service import client as weather_client
 from src.weather_service.router import router as weather_service_router
 
 REDIS_URL = str(settings.REDIS_URL)
@@ -24,11 +31,24 @@ async def lifespan(_application: FastAPI) -> AsyncGenerator:
         decode_responses=True,
     )
     redis.redis_client = aioredis.Redis(connection_pool=pool)
+    binary_pool = aioredis.ConnectionPool.from_url(REDIS_URL, max_connections=10)
+    redis.redis_binary_client = aioredis.Redis(connection_pool=binary_pool)
+    keys.keyring = keys.load_keyring()
+    weather_client.http_client = weather_client.create_http_client()
+    invalidation_listener = asyncio.create_task(weather_cache.listen_invalidations())
+    refresh_token_purge = asyncio.create_task(purge_refresh_tokens_periodically())
+    replica_health_check = asyncio.create_task(database.check_replicas_periodically())
     yield
+    replica_health_check.cancel()
+    refresh_token_purge.cancel()
+    invalidation_listener.cancel()
+    await weather_client.http_client.aclose()
+    shutdown_hasher_pool()
+    await binary_pool.disconnect()
     await pool.disconnect()
 
 
-app = FastAPI(**app_configs, lifespan=lifespan)
+app = FastAPI(**app_configs, default_response_class=ORJSONResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,6 +57,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=("GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"),
     allow_headers=settings.CORS_HEADERS,
+    expose_headers=("X-Next-Cursor",),
 )
 
 app.include_router(auth_router, prefix="/auth")
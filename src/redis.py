@@ -3,8 +3,13 @@ from typing import Optional
 
 from pydantic import BaseModel
 from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+from redis.asyncio.lock import Lock
+from redis.commands.core import AsyncScript
 
 redis_client: Redis = None  # type: ignore
+# same server, values are returned as bytes, for binary encoded values
+redis_binary_client: Redis = None  # type: ignore
 
 
 class RedisData(BaseModel):
@@ -22,9 +27,44 @@ async def set_redis_key(redis_data: RedisData, *, is_transaction: bool = False)
         await pipe.execute()
 
 
+async def set_redis_keys(
+    redis_data: list[RedisData], *, is_transaction: bool = False
+) -> None:
+    async with redis_client.pipeline(transaction=is_transaction) as pipe:
+        for data in redis_data:
+            ttl = data.ttl
+            if isinstance(ttl, timedelta):
+                ttl = ttl.total_seconds()
+            if ttl is not None and ttl <= 0:
+                continue  # expired already, SET rejects a non-positive EX
+            await pipe.set(data.key, data.value, ex=data.ttl)
+
+        await pipe.execute()
+
+
 async def get_by_key(key: str) -> str | None:
     return await redis_client.get(key)
 
 
+async def get_by_keys(keys: list[str]) -> list[str | None]:
+    return await redis_client.mget(keys)
+
+
 async def delete_by_key(key: str) -> None:
     return await redis_client.delete(key)
+
+
+async def publish(channel: str, message: str) -> None:
+    await redis_client.publish(channel, message)
+
+
+def get_pubsub() -> PubSub:
+    return redis_client.pubsub(ignore_subscribe_messages=True)
+
+
+def get_lock(key: str, timeout: float) -> Lock:
+    return redis_client.lock(f"lock:{key}", timeout=timeout, blocking=False)
+
+
+def register_script(script: str) -> AsyncScript:
+    return redis_client.register_script(script)
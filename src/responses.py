@@ -0,0 +1,29 @@
+from typing import Any, Mapping
+
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+
+class ModelResponse(Response):
+    """
+    Render a pydantic model straight to JSON bytes with its own serializer,
+    without building the python dict in between. The keyword arguments
+    are those of model_dump_json, e.g. exclude_none or context.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: BaseModel,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        background: BackgroundTask | None = None,
+        **dump_options: Any,
+    ) -> None:
+        self.dump_options = dump_options
+        super().__init__(content, status_code, headers, background=background)
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.__pydantic_serializer__.to_json(content, **self.dump_options)
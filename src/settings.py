@@ -4,7 +4,10 @@ from src.config.config import BaseConfig, PostgreSQL
 
 # default postgresql docker settings
 settings = BaseConfig()
-db_settings = PostgreSQL(url=str(settings.DATABASE_URL))
+db_settings = PostgreSQL(
+    url=str(settings.DATABASE_URL),
+    replica_urls=[str(url) for url in settings.DATABASE_REPLICA_URLS],
+)
 
 app_configs: dict[str, Any] = {
     "title": "App API",
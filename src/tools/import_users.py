@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterator, TextIO
+
+from pydantic import ValidationError
+
+from src.auth.schemas import HashedUser, NewUser
+from src.auth.security import hash_password
+from src.database import engine
+
+# rows of the current chunk, emptied by every commit
+CREATE_STAGING_TABLE = """
+CREATE TEMPORARY TABLE auth_user_import (
+    line bigint NOT NULL,
+    email varchar NOT NULL,
+    password varchar NOT NULL,
+    is_admin boolean NOT NULL
+) ON COMMIT DELETE ROWS
+"""
+STAGING_COLUMNS = ("line", "email", "password", "is_admin")
+
+# the first row of every email is inserted unless the email is taken,
+# returns the rows that weren't inserted
+MERGE_STAGING_TABLE = """
+WITH first_rows AS (
+    SELECT DISTINCT ON (lower(email)) line, email, password, is_admin
+    FROM auth_user_import
+    ORDER BY lower(email), line
+), inserted AS (
+    INSERT INTO auth_user (email, password, is_admin)
+    SELECT email, password, is_admin FROM first_rows
+    ON CONFLICT (lower(email)) DO NOTHING
+    RETURNING lower(email) AS email
+)
+SELECT line, email FROM auth_user_import
+WHERE line NOT IN (
+    SELECT line FROM first_rows WHERE lower(email) IN (SELECT email FROM inserted)
+)
+ORDER BY line
+"""
+
+Row = tuple[int, dict[str, Any]]  # line number, fields
+
+
+def read_rows(file: TextIO, file_format: str) -> Iterator[Row]:
+    """Rows of a CSV file with a header or of an NDJSON file, one at a time"""
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line, text in enumerate(file, start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except json.JSONDecodeError as er:
+            yield line, {"_error": f"Invalid JSON: {er}"}
+
+
+def validate_row(row: dict[str, Any]) -> NewUser | HashedUser:
+    if not isinstance(row, dict):
+        raise ValueError("A row must be a JSON object")
+    if "_error" in row:
+        raise ValueError(row["_error"])
+
+    # empty CSV cells are missing values
+    fields = {key: value for key, value in row.items() if value not in ("", None)}
+    if "password_hash" in fields:
+        return HashedUser(**fields)
+    return NewUser(**fields)
+
+
+class ImportReport:
+    def __init__(self, errors: TextIO):
+        self.errors = errors
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        self.errors.write(json.dumps({"line": line, "error": error}) + "\n")
+
+    def progress(self) -> str:
+        elapsed = time.monotonic() - self.started
+        return (
+            f"{self.read} rows read, {self.imported} imported, "
+            f"{self.rejected} rejected in {elapsed:.1f}s "
+            f"({self.read / max(elapsed, 1e-9):.0f} rows/s)"
+        )
+
+
+def _error_message(er: ValidationError) -> str:
+    """Field and reason of every error, never the input: it may be a password"""
+    return "; ".join(
+        f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+        for error in er.errors(include_input=False, include_url=False)
+    )
+
+
+def _validate_chunk(
+    rows: list[Row], report: ImportReport
+) -> list[tuple[int, NewUser | HashedUser]]:
+    users = []
+    for line, row in rows:
+        try:
+            users.append((line, validate_row(row)))
+        except ValidationError as er:
+            report.reject(line, _error_message(er))
+        except (TypeError, ValueError) as er:
+            report.reject(line, str(er))
+    return users
+
+
+async def _password_hash(pool: ProcessPoolExecutor, user: NewUser | HashedUser) -> str:
+    if isinstance(user, HashedUser):
+        return user.password_hash
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, hash_password, user.password)
+
+
+async def _hash_chunk(
+    pool: ProcessPoolExecutor, users: list[tuple[int, NewUser | HashedUser]]
+) -> list[tuple[int, str, str, bool]]:
+    """bcrypt runs in the worker processes, the whole chunk keeps all of them busy"""
+    hashes = await asyncio.gather(*(_password_hash(pool, user) for _, user in users))
+    return [
+        (line, user.email, password, user.is_admin)
+        for (line, user), password in zip(users, hashes, strict=True)
+    ]
+
+
+async def import_users(
+    file: TextIO,
+    *,
+    file_format: str,
+    chunk_size: int,
+    workers: int,
+    errors: TextIO,
+) -> ImportReport:
+    """
+    Import the users chunk by chunk, only one chunk is held in memory.
+    Every chunk is copied into a staging table and merged in its own
+    transaction, so an interrupted import keeps the chunks already done.
+    """
+    report = ImportReport(errors)
+    rows = read_rows(file, file_format)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        async with engine.connect() as conn:
+            raw_connection = await conn.get_raw_connection()
+            driver = raw_connection.driver_connection
+            await driver.execute(CREATE_STAGING_TABLE)
+
+            while chunk := list(islice(rows, chunk_size)):
+                report.read += len(chunk)
+                records = await _hash_chunk(pool, _validate_chunk(chunk, report))
+                if not records:
+                    continue
+                async with driver.transaction():
+                    await driver.copy_records_to_table(
+                        "auth_user_import", records=records, columns=STAGING_COLUMNS
+                    )
+                    skipped = await driver.fetch(MERGE_STAGING_TABLE)
+
+                report.imported += len(records) - len(skipped)
+                for line, email in skipped:
+                    report.reject(line, f"Email {email} is already taken")
+                print(report.progress(), flush=True)
+
+    return report
+
+
+async def run():
+    parser = argparse.ArgumentParser(conflict_handler="resolve")
+    parser.add_argument("path", type=Path, help="CSV or NDJSON file of users")
+    parser.add_argument(
+        "--format", "-f", dest="file_format", choices=("csv", "ndjson"), default=None
+    )
+    parser.add_argument("--chunk-size", "-c", dest="chunk_size", type=int, default=5000)
+    parser.add_argument(
+        "--workers", "-w", dest="workers", type=int, default=os.cpu_count()
+    )
+    parser.add_argument(
+        "--errors",
+        "-e",
+        dest="errors",
+        type=Path,
+        default=None,
+        help="NDJSON file of the rejected rows, stderr by default",
+    )
+    args = parser.parse_args()
+
+    file_format = args.file_format or (
+        "csv" if args.path.suffix.lower() == ".csv" else "ndjson"
+    )
+    errors = args.errors.open("w") if args.errors else sys.stderr
+    try:
+        with args.path.open(newline="") as file:
+            report = await import_users(
+                file,
+                file_format=file_format,
+                chunk_size=args.chunk_size,
+                workers=args.workers,
+                errors=errors,
+            )
+    finally:
+        if errors is not sys.stderr:
+            errors.close()
+
+    print(f"Done, {report.progress()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
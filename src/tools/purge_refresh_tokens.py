@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+from datetime import timedelta
+
+from src.auth.config import auth_config
+from src.auth.service import purge_expired_refresh_tokens
+
+
+async def run():
+    parser = argparse.ArgumentParser(conflict_handler="resolve")
+    parser.add_argument(
+        "--retention-days",
+        "-r",
+        dest="retention_days",
+        type=float,
+        default=auth_config.REFRESH_TOKEN_PURGE_RETENTION / 86400,
+    )
+    parser.add_argument(
+        "--batch-size",
+        "-b",
+        dest="batch_size",
+        type=int,
+        default=auth_config.REFRESH_TOKEN_PURGE_BATCH_SIZE,
+    )
+    parser.add_argument(
+        "--pause",
+        "-p",
+        dest="pause",
+        type=float,
+        default=auth_config.REFRESH_TOKEN_PURGE_PAUSE,
+    )
+    args = parser.parse_args()
+
+    deleted, elapsed = await purge_expired_refresh_tokens(
+        retention=timedelta(days=args.retention_days),
+        batch_size=args.batch_size,
+        pause=args.pause,
+    )
+    print(f"Purged {deleted} refresh tokens in {elapsed:.2f}s")
+
+
+asyncio.run(run())
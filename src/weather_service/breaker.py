@@ -0,0 +1,127 @@
+import time
+from collections import deque
+
+from src.weather_service.config import weather_service_config
+from src.weather_service.constants import BreakerState
+from src.weather_service.schemas import BreakerStats
+
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream endpoint once too many of the recent calls failed.
+    Closed: calls pass, outcomes are kept for the last window seconds, and the
+    breaker opens when the failure rate of at least min_calls reaches the limit.
+    Open: calls are rejected for open_seconds.
+    Half-open: a few probe calls pass, the breaker closes after half_open_calls
+    successes and opens again on any failure.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        window: float = weather_service_config.BREAKER_WINDOW,
+        min_calls: int = weather_service_config.BREAKER_MIN_CALLS,
+        failure_rate: float = weather_service_config.BREAKER_FAILURE_RATE,
+        open_seconds: float = weather_service_config.BREAKER_OPEN_SECONDS,
+        half_open_calls: int = weather_service_config.BREAKER_HALF_OPEN_CALLS,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._state = BreakerState.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0  # probe calls let through while half-open
+        self._successful_probes = 0
+        self._probes_started_at = 0.0
+        self._outcomes: deque[tuple[float, bool]] = deque()
+
+    @property
+    def state(self) -> BreakerState:
+        if (
+            self._state is BreakerState.OPEN
+            and time.monotonic() - self._opened_at >= self.open_seconds
+        ):
+            self._state = BreakerState.HALF_OPEN
+            self._start_probes()
+        return self._state
+
+    def allow(self) -> bool:
+        state = self.state
+        if state is BreakerState.CLOSED:
+            return True
+        if state is BreakerState.OPEN:
+            return False
+
+        if (
+            self._probes >= self.half_open_calls
+            and time.monotonic() - self._probes_started_at >= self.open_seconds
+        ):
+            self._start_probes()  # the probes were lost without an outcome
+        if self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._state is BreakerState.HALF_OPEN:
+            self._successful_probes += 1
+            if self._successful_probes >= self.half_open_calls:
+                self._close()
+            return
+        self._record(True)
+
+    def record_failure(self) -> None:
+        if self._state is BreakerState.HALF_OPEN:
+            self._open()
+            return
+        self._record(False)
+        if self._state is BreakerState.CLOSED and self._should_open():
+            self._open()
+
+    def stats(self) -> BreakerStats:
+        self._expire()
+        return BreakerStats(
+            state=self.state,
+            calls=len(self._outcomes),
+            failure_rate=self._current_failure_rate(),
+        )
+
+    def _record(self, ok: bool) -> None:
+        self._outcomes.append((time.monotonic(), ok))
+        self._expire()
+
+    def _expire(self) -> None:
+        horizon = time.monotonic() - self.window
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            self._outcomes.popleft()
+
+    def _current_failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return failures / len(self._outcomes)
+
+    def _should_open(self) -> bool:
+        return (
+            len(self._outcomes) >= self.min_calls
+            and self._current_failure_rate() >= self.failure_rate
+        )
+
+    def _start_probes(self) -> None:
+        self._probes = 0
+        self._successful_probes = 0
+        self._probes_started_at = time.monotonic()
+
+    def _open(self) -> None:
+        self._state = BreakerState.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def _close(self) -> None:
+        self._state = BreakerState.CLOSED
+        self._outcomes.clear()
@@ -0,0 +1,522 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+from asyncio import Task
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+from fastapi.logger import logger
+from pydantic import BaseModel
+from redis.asyncio.lock import Lock
+from redis.exceptions import LockError, RedisError
+
+from src.redis import (
+    RedisData,
+    get_by_key,
+    get_by_keys,
+    get_lock,
+    get_pubsub,
+    publish,
+    set_redis_keys,
+)
+from src.weather_service.config import weather_service_config
+from src.weather_service.schemas import (
+    Coordinates,
+    GeocodingAPIResponse,
+    Weather,
+    WeatherAPIResponse,
+)
+from src.weather_service.utils import fan_out
+
+Loader = Callable[[], Awaitable[str]]
+TTL = int | Callable[[str], int]  # seconds, or seconds for the loaded value
+
+
+def _schema_version(*models: type[BaseModel]) -> str:
+    """Short digest of the cached models, changes whenever one of the schemas does"""
+    schemas = [model.model_json_schema(mode="serialization") for model in models]
+    digest = hashlib.blake2s(
+        json.dumps(schemas, sort_keys=True).encode(), digest_size=4
+    )
+    return digest.hexdigest()
+
+
+CACHE_KEY_VERSION = _schema_version(Weather, GeocodingAPIResponse, WeatherAPIResponse)
+
+
+def _canonical_params(model: BaseModel) -> dict[str, str]:
+    if isinstance(model, Coordinates):
+        model = model.quantize(weather_service_config.CACHE_COORDINATE_GRID)
+        return {"lat": f"{model.lat}", "lon": f"{model.lon}"}
+
+    return {
+        field: f"{value}".strip().casefold()
+        for field, value in model.model_dump(exclude_none=True).items()
+    }
+
+
+def build_cache_key(namespace: str, *models: BaseModel) -> str:
+    """
+    Build a versioned key from validated request models, so equal requests
+    share an entry whatever the order, case or precision of the query params
+    """
+    params: dict[str, str] = {}
+    for model in models:
+        params.update(_canonical_params(model))
+
+    query = "&".join(f"{field}={params[field]}" for field in sorted(params))
+    return (
+        f"{weather_service_config.CACHE_KEY_PREFIX}:{CACHE_KEY_VERSION}:"
+        f"{namespace}:{query}"
+    )
+
+
+class CacheEntry(BaseModel):
+    value: str
+    expires_at: float  # unix time after which the entry is stale
+    delta: float = 0.0  # seconds spent to compute the value
+
+    def dumps(self) -> str:
+        return f"{self.expires_at}|{self.delta}|{self.value}"
+
+    @classmethod
+    def loads(cls, raw: str) -> "CacheEntry":
+        expires_at, delta, value = raw.split("|", 2)
+        return cls(value=value, expires_at=float(expires_at), delta=float(delta))
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def should_refresh(self, beta: float) -> bool:
+        """
+        Probabilistic early expiration (XFetch), the closer the entry is to
+        its expiry and the slower it is to recompute, the more likely
+        a request refreshes it ahead of time
+        """
+        if self.is_stale:
+            return True
+        if beta <= 0 or self.delta <= 0:
+            return False
+        jitter = -self.delta * beta * math.log(1.0 - random.random())
+        return time.time() + jitter >= self.expires_at
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-process call"""
+
+    def __init__(self):
+        self._calls: dict[str, Task] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(func(), name=f"SingleFlight-{key}")
+            self._calls[key] = task
+            task.add_done_callback(partial(self._forget, key))
+        # shield the shared call, so a disconnected caller doesn't cancel it for others
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved, callers already got it
+
+
+class MemoryCache:
+    """
+    Per worker LRU tier in front of redis, bounded by the number of items
+    and by the size of the stored values
+    """
+
+    def __init__(self, max_items: int, max_bytes: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (entry, unix time after which the entry can't be served, size)
+        self._data: OrderedDict[str, tuple[CacheEntry, float, int]] = OrderedDict()
+
+    def get(self, key: str) -> CacheEntry | None:
+        item = self._data.get(key)
+        if item is None or item[1] <= time.time():
+            if item is not None:
+                self.delete(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def set(self, key: str, entry: CacheEntry, stale_ttl: int) -> None:
+        size = len(key) + len(entry.value)
+        # the previous value of the key is replaced either way
+        self.delete(key)
+        if size > self.max_bytes:
+            return
+
+        self._data[key] = (entry, entry.expires_at + stale_ttl, size)
+        self.size += size
+        while len(self._data) > self.max_items or self.size > self.max_bytes:
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.size -= item[2]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "items": len(self._data),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+single_flight = SingleFlight()
+memory_cache = MemoryCache(
+    max_items=weather_service_config.MEMORY_CACHE_MAX_ITEMS,
+    max_bytes=weather_service_config.MEMORY_CACHE_MAX_BYTES,
+)
+WORKER_ID = uuid.uuid4().hex
+_background_tasks: set[Task] = set()
+
+
+def _parse_entry(key: str, raw: str) -> CacheEntry | None:
+    """
+    Entries written in another format, e.g. by the previous release during
+    a deploy, are treated as misses and overwritten by the next load
+    """
+    try:
+        return CacheEntry.loads(raw)
+    except ValueError:
+        logger.warning("Unreadable cache entry %s is ignored", key)
+        return None
+
+
+async def read_entry(
+    key: str, stale_ttl: int = weather_service_config.CACHE_STALE_TTL
+) -> CacheEntry | None:
+    if entry := memory_cache.get(key):
+        return entry
+
+    try:
+        raw = await get_by_key(key)
+    except RedisError as er:
+        logger.error("Redis error %s:", er)
+        return None
+
+    if not raw or (entry := _parse_entry(key, raw)) is None:
+        return None
+
+    memory_cache.set(key, entry, stale_ttl)
+    return entry
+
+
+async def read_entries(
+    keys: list[str], stale_ttl: int = weather_service_config.CACHE_STALE_TTL
+) -> list[CacheEntry | None]:
+    """Read the keys from the memory tier, and the rest with one MGET"""
+    entries = [memory_cache.get(key) for key in keys]
+    missing = [i for i, entry in enumerate(entries) if entry is None]
+    if not missing:
+        return entries
+
+    try:
+        raws = await get_by_keys([keys[i] for i in missing])
+    except RedisError as er:
+        logger.error("Redis error %s:", er)
+        return entries
+
+    for i, raw in zip(missing, raws, strict=True):
+        if raw and (entry := _parse_entry(keys[i], raw)) is not None:
+            entries[i] = entry
+            memory_cache.set(keys[i], entry, stale_ttl)
+    return entries
+
+
+def _redis_data(key: str, entry: CacheEntry, stale_ttl: int) -> RedisData:
+    ttl = max(math.ceil(entry.expires_at - time.time()), 0) + stale_ttl
+    return RedisData(key=key, value=entry.dumps(), ttl=ttl)
+
+
+async def write_entries(entries: dict[str, CacheEntry], stale_ttl: int) -> None:
+    """Write the entries with one pipeline and invalidate other workers' copies"""
+    for key, entry in entries.items():
+        memory_cache.set(key, entry, stale_ttl)
+
+    try:
+        await set_redis_keys(
+            [_redis_data(key, entry, stale_ttl) for key, entry in entries.items()]
+        )
+        await publish(
+            weather_service_config.CACHE_INVALIDATION_CHANNEL,
+            "\n".join([WORKER_ID, *entries]),
+        )
+    except RedisError as er:
+        logger.error("Redis error %s:", er)
+
+
+async def write_entry(key: str, entry: CacheEntry, stale_ttl: int) -> None:
+    await write_entries({key: entry}, stale_ttl)
+
+
+async def listen_invalidations() -> None:
+    """Drop keys rewritten by other workers from the memory tier"""
+    channel = weather_service_config.CACHE_INVALIDATION_CHANNEL
+    while True:
+        try:
+            async with get_pubsub() as pubsub:
+                await pubsub.subscribe(channel)
+                async for message in pubsub.listen():
+                    worker_id, *keys = message["data"].split("\n")
+                    if worker_id != WORKER_ID:
+                        for key in keys:
+                            memory_cache.delete(key)
+        except RedisError as er:
+            logger.error("Redis error %s:", er)
+            # invalidations may have been missed while disconnected
+            memory_cache.clear()
+            await asyncio.sleep(1)
+
+
+async def _compute(loader: Loader, ttl: TTL) -> CacheEntry:
+    started = time.monotonic()
+    value = await loader()
+    return CacheEntry(
+        value=value,
+        expires_at=time.time() + (ttl(value) if callable(ttl) else ttl),
+        delta=time.monotonic() - started,
+    )
+
+
+async def _load(key: str, loader: Loader, ttl: TTL, stale_ttl: int) -> CacheEntry:
+    entry = await _compute(loader, ttl)
+    await write_entry(key, entry, stale_ttl)
+    return entry
+
+
+async def _wait_for_entry(
+    key: str, timeout: float, stale_ttl: int
+) -> CacheEntry | None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        if entry := await read_entry(key, stale_ttl):
+            return entry
+    return None
+
+
+async def _acquire(key: str) -> Lock | None:
+    lock = get_lock(key, weather_service_config.CACHE_LOCK_TIMEOUT)
+    try:
+        return lock if await lock.acquire() else None
+    except RedisError as er:
+        logger.error("Redis error %s:", er)
+        return lock  # redis is unavailable, load without coordination
+
+
+async def _release(lock: Lock) -> None:
+    try:
+        await lock.release()
+    except (LockError, RedisError):
+        # lock expired or redis is gone, nothing to release
+        pass
+
+
+async def _load_on_miss(
+    key: str, loader: Loader, ttl: TTL, stale_ttl: int
+) -> CacheEntry:
+    lock = await _acquire(key)
+    if lock is None:
+        # another worker is loading the key, wait for its result
+        entry = await _wait_for_entry(
+            key, weather_service_config.CACHE_LOCK_WAIT, stale_ttl
+        )
+        if entry:
+            return entry
+
+    try:
+        return await _load(key, loader, ttl, stale_ttl)
+    finally:
+        if lock is not None:
+            await _release(lock)
+
+
+async def _refresh(
+    key: str, loader: Loader, ttl: TTL, stale_ttl: int, stale: CacheEntry
+) -> CacheEntry:
+    lock = await _acquire(key)
+    if lock is None:
+        return stale  # another worker is already refreshing the key
+
+    try:
+        return await _load(key, loader, ttl, stale_ttl)
+    except Exception as er:
+        logger.error("Cache refresh of %s failed: %s", key, er)
+        return stale
+    finally:
+        await _release(lock)
+
+
+class _BatchLoad:
+    """
+    Misses of one cached_call_many, loaded under the same cross-worker locks
+    as cached_call and written with one pipeline once the fan-out is over.
+    The locks are held until then, so other workers wait for the write.
+    """
+
+    def __init__(self, stale_ttl: int):
+        self.stale_ttl = stale_ttl
+        self.loaded: dict[str, CacheEntry] = {}
+        self.locks: list[Lock] = []
+        self.written = False
+
+    async def load(self, key: str, loader: Loader, ttl: TTL) -> CacheEntry:
+        lock = await _acquire(key)
+        if lock is None:
+            # another worker is loading the key, wait for its result
+            entry = await _wait_for_entry(
+                key, weather_service_config.CACHE_LOCK_WAIT, self.stale_ttl
+            )
+            if entry:
+                return entry
+
+        try:
+            entry = await _compute(loader, ttl)
+        except BaseException:
+            if lock is not None:
+                await _release(lock)
+            raise
+
+        if not self.written:
+            self.loaded[key] = entry
+            if lock is not None:
+                self.locks.append(lock)
+            return entry
+
+        # the batch was over before the call, write the entry on its own
+        try:
+            await write_entry(key, entry, self.stale_ttl)
+        finally:
+            if lock is not None:
+                await _release(lock)
+        return entry
+
+    async def write(self) -> None:
+        self.written = True
+        try:
+            if self.loaded:
+                await write_entries(self.loaded, self.stale_ttl)
+        finally:
+            for lock in self.locks:
+                await _release(lock)
+
+
+def _schedule_refresh(
+    key: str, loader: Loader, ttl: TTL, stale_ttl: int, stale: CacheEntry
+) -> None:
+    if single_flight.in_flight(key):
+        return
+
+    task = asyncio.create_task(
+        single_flight.do(key, partial(_refresh, key, loader, ttl, stale_ttl, stale))
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def cached_call(
+    key: str,
+    loader: Loader,
+    ttl: TTL,
+    *,
+    stale_ttl: int = weather_service_config.CACHE_STALE_TTL,
+    beta: float = weather_service_config.CACHE_EARLY_EXPIRATION_BETA,
+) -> str:
+    """
+    Return the cached value of the key or load it with the loader.
+    Hits are served from the worker memory first, then from redis.
+    Stale and soon to expire entries are served as is and refreshed in
+    background, misses are coalesced into one loader call per key
+    inside the worker and guarded by a short redis lock across workers.
+    """
+    entry = await read_entry(key, stale_ttl)
+    if entry is not None:
+        if entry.should_refresh(beta):
+            _schedule_refresh(key, loader, ttl, stale_ttl, entry)
+        return entry.value
+
+    entry = await single_flight.do(
+        key, partial(_load_on_miss, key, loader, ttl, stale_ttl)
+    )
+    return entry.value
+
+
+async def cached_call_many(
+    loaders: dict[str, Loader],
+    ttl: TTL,
+    *,
+    stale_ttl: int = weather_service_config.CACHE_STALE_TTL,
+    beta: float = weather_service_config.CACHE_EARLY_EXPIRATION_BETA,
+    concurrency: int | None = None,
+    timeout: float | None = None,
+    deadline: float | None = None,
+) -> tuple[dict[str, str], dict[str, BaseException]]:
+    """
+    Same as cached_call for several keys at once, all the keys are read
+    with one MGET, only the missed ones are loaded with fan_out, coalesced
+    and locked as in cached_call, and written back with one pipeline.
+    Return the values and the load errors by key.
+    """
+    keys = list(loaders)
+    values: dict[str, str] = {}
+    missing: list[str] = []
+    for key, entry in zip(keys, await read_entries(keys, stale_ttl), strict=True):
+        if entry is None:
+            missing.append(key)
+            continue
+        if entry.should_refresh(beta):
+            _schedule_refresh(key, loaders[key], ttl, stale_ttl, entry)
+        values[key] = entry.value
+
+    if not missing:
+        return values, {}
+
+    batch = _BatchLoad(stale_ttl)
+    try:
+        entries, errors = await fan_out(
+            {
+                key: partial(
+                    single_flight.do, key, partial(batch.load, key, loaders[key], ttl)
+                )
+                for key in missing
+            },
+            concurrency=concurrency,
+            timeout=timeout,
+            deadline=deadline,
+        )
+    finally:
+        await batch.write()
+    values.update({key: entry.value for key, entry in entries.items()})
+    return values, errors
@@ -1,7 +1,19 @@
+import asyncio
+import random
+
 import httpx
 
 from src.settings import settings
-from src.weather_service.exceptions import InvalidResponseError, InvalidTokenError
+from src.weather_service.breaker import CircuitBreaker
+from src.weather_service.config import weather_service_config
+from src.weather_service.exceptions import (
+    InvalidResponseError,
+    InvalidTokenError,
+    UpstreamRateLimitedError,
+    UpstreamTimeoutError,
+    UpstreamUnavailableError,
+)
+from src.weather_service.limiter import TokenBucketLimiter
 from src.weather_service.schemas import (
     Coordinates,
     GeocodingAPIResponse,
@@ -10,6 +22,30 @@ from src.weather_service.schemas import (
     Weather,
 )
 
+http_client: httpx.AsyncClient = None  # type: ignore
+
+breakers: dict[str, CircuitBreaker] = {
+    "geocoding": CircuitBreaker("geocoding"),
+    "weather": CircuitBreaker("weather"),
+}
+
+limiter = TokenBucketLimiter(settings.WEATHER_SERVICE_APIKEY)
+
+TRANSIENT_STATUS_CODES = frozenset({502, 503, 504})
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build the long-lived connection pool shared by every Client of the worker"""
+    return httpx.AsyncClient(
+        http2=weather_service_config.WEATHER_SERVICE_HTTP2,
+        timeout=weather_service_config.WEATHER_SERVICE_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=weather_service_config.WEATHER_SERVICE_MAX_CONNECTIONS,
+            max_keepalive_connections=weather_service_config.WEATHER_SERVICE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=weather_service_config.WEATHER_SERVICE_KEEPALIVE_EXPIRY,
+        ),
+    )
+
 
 class Client:
     """
@@ -18,43 +54,121 @@ class Client:
     """
 
     BASE_URL: str = "https://api.openweathermap.org/data/2.5/weather"
-    GEO_BASE_URL: str = "http://api.openweathermap.org/geo/1.0/direct"
+    GEO_BASE_URL: str = "https://api.openweathermap.org/geo/1.0/direct"
     APIKEY: str = settings.WEATHER_SERVICE_APIKEY
 
-    @property
-    def client(self):
-        return httpx.AsyncClient(timeout=5.0)
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def _send(
+        self, url: str, params: dict, timeout: float | None = None
+    ) -> httpx.Response:
+        await limiter.acquire()
+        if timeout is None:
+            return await self.client.get(url, params=params)
+        return await self.client.get(url, params=params, timeout=timeout)
+
+    async def _get_with_retries(
+        self, url: str, params: dict, timeout: float | None = None
+    ) -> httpx.Response:
+        """
+        Retry transport errors and transient statuses with exponential backoff
+        and full jitter, it is safe because every remote call is an idempotent GET.
+        Timeouts are not retried, every attempt would wait for the whole timeout
+        again and a hung upstream would hold the request far beyond its budget.
+        """
+        retries = weather_service_config.WEATHER_SERVICE_RETRIES
+        backoff = weather_service_config.WEATHER_SERVICE_RETRY_BACKOFF
+        for attempt in range(retries):
+            try:
+                response = await self._send(url, params, timeout)
+            except httpx.TimeoutException:
+                raise
+            except httpx.TransportError:
+                pass
+            else:
+                if response.status_code not in TRANSIENT_STATUS_CODES:
+                    return response
+            await asyncio.sleep(random.uniform(0, backoff * 2**attempt))
+
+        return await self._send(url, params, timeout)
+
+    async def _get(
+        self, endpoint: str, url: str, params: dict, timeout: float | None = None
+    ) -> httpx.Response:
+        """
+        GET through the circuit breaker of the remote endpoint, timeout overrides
+        the one of the http client, e.g. to fail within a fan-out budget
+        """
+        breaker = breakers[endpoint]
+        if not breaker.allow():
+            raise UpstreamUnavailableError(f"Circuit breaker of {endpoint} is open")
+
+        try:
+            response = await self._get_with_retries(url, params, timeout)
+        except httpx.TimeoutException as er:
+            breaker.record_failure()
+            raise UpstreamTimeoutError(f"{endpoint}: {er!r}") from er
+        except httpx.TransportError as er:
+            breaker.record_failure()
+            raise UpstreamUnavailableError(f"{endpoint}: {er!r}") from er
+
+        if response.status_code in TRANSIENT_STATUS_CODES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response) -> None:
+        if response.is_success:
+            return
+        if response.status_code == 401:
+            raise InvalidTokenError("Remote client authentication issue")
+        if response.status_code == 429:
+            raise UpstreamRateLimitedError("Remote server rejected the request quota")
+        raise InvalidResponseError(response.json())
+
+    async def fetch_location(
+        self, loc: Location, limit: int = 5, *, timeout: float | None = None
+    ) -> bytes:
+        """Raw geocoding response, a JSON list of the found locations"""
+        params = {
+            "q": f"{loc.city},{loc.country}",
+            "limit": limit,
+            "appid": self.APIKEY,
+        }
+        response = await self._get("geocoding", self.GEO_BASE_URL, params, timeout)
+        self._raise_for_status(response)
+
+        return response.read()
 
     async def get_location(self, loc: Location, limit: int = 5) -> GeocodingAPIResponse:
-        async with self.client as client:
-            params = {
-                "q": f"{loc.city},{loc.country}",
-                "limit": limit,
-                "appid": self.APIKEY,
-            }
-            response = await client.get(self.GEO_BASE_URL, params=params)
-            if not response.is_success:
-                if response.status_code == 401:
-                    raise InvalidTokenError("Remote client authentication issue")
-                raise InvalidResponseError(response.json())
-
-            geo_list = GeocodingList.model_validate_json(response.read())
-            return GeocodingAPIResponse(entries=geo_list)
+        geo_list = GeocodingList.model_validate_json(
+            await self.fetch_location(loc, limit)
+        )
+        return GeocodingAPIResponse(entries=geo_list)
+
+    async def fetch_weather(
+        self,
+        coordinate: Coordinates,
+        units: str = "metric",
+        *,
+        timeout: float | None = None,
+    ) -> bytes:
+        """Raw current weather response for the coordinates"""
+        params = {
+            "lat": f"{coordinate.lat}",
+            "lon": f"{coordinate.lon}",
+            "units": units,
+            "appid": self.APIKEY,
+        }
+        response = await self._get("weather", self.BASE_URL, params, timeout)
+        self._raise_for_status(response)
+
+        return response.read()
 
     async def get_weather(
         self, coordinate: Coordinates, units: str = "metric"
     ) -> Weather:
-        async with self.client as client:
-            params = {
-                "lat": f"{coordinate.lat}",
-                "lon": f"{coordinate.lon}",
-                "units": units,
-                "appid": self.APIKEY,
-            }
-            response = await client.get(self.BASE_URL, params=params)
-            if not response.is_success:
-                if response.status_code == 401:
-                    raise InvalidTokenError("Remote client authentication issue")
-                raise InvalidResponseError(response.json())
-
-            return Weather.model_validate_json(response.read())
+        return Weather.model_validate_json(await self.fetch_weather(coordinate, units))
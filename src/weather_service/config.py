@@ -0,0 +1,50 @@
+from src.models.models import CustomSettings
+
+
+class WeatherServiceConfig(CustomSettings):
+    WEATHER_SERVICE_TIMEOUT: float = 5.0  # seconds
+    WEATHER_SERVICE_HTTP2: bool = True
+    WEATHER_SERVICE_MAX_CONNECTIONS: int = 100
+    WEATHER_SERVICE_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    WEATHER_SERVICE_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    WEATHER_SERVICE_RETRIES: int = 2  # transient failures only
+    WEATHER_SERVICE_RETRY_BACKOFF: float = 0.1  # seconds, doubled on every retry
+
+    RATE_LIMIT_PER_MINUTE: int = 60  # remote calls allowed for the api key, all pods
+    RATE_LIMIT_BURST: int = 60  # bucket capacity
+    RATE_LIMIT_LEASE: int = 5  # tokens taken from redis at once by a worker
+    RATE_LIMIT_MAX_WAIT: float = 1.0  # seconds a call may queue for a token
+    RATE_LIMIT_USAGE_RETENTION: int = 60 * 60 * 24 * 7  # per minute counters, 7 days
+
+    BREAKER_WINDOW: float = 30.0  # seconds of calls the failure rate is computed on
+    BREAKER_MIN_CALLS: int = 10  # calls in the window before the breaker may open
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_OPEN_SECONDS: float = 15.0
+    BREAKER_HALF_OPEN_CALLS: int = 3  # successful probes needed to close again
+
+    WEATHER_FAN_OUT_CONCURRENCY: int = 5  # upstream calls in flight per request
+    WEATHER_FAN_OUT_TASK_TIMEOUT: float = 3.0  # seconds per upstream call
+    WEATHER_FAN_OUT_BUDGET: float = 4.0  # seconds per request
+
+    WEATHER_BATCH_MAX_ITEMS: int = 100
+    WEATHER_BATCH_CONCURRENCY: int = 10  # upstream calls in flight per batch
+    WEATHER_BATCH_BUDGET: float = 10.0  # seconds per batch
+
+    CACHE_KEY_PREFIX: str = "weather"
+    CACHE_COORDINATE_GRID: float = 0.01  # degrees, ~1.1 km of latitude
+    CACHE_STALE_TTL: int = 300  # seconds a stale entry may still be served
+    CACHE_LOCK_TIMEOUT: float = 5.0  # seconds
+    CACHE_LOCK_WAIT: float = 2.0  # seconds to wait for another worker's result
+    CACHE_EARLY_EXPIRATION_BETA: float = 1.0  # 0 disables early expiration
+    CACHE_INVALIDATION_CHANNEL: str = "weather-cache:invalidate"
+
+    WEATHER_CACHE_TTL: int = 60  # seconds
+    GEOCODING_CACHE_TTL: int = 60 * 60 * 24 * 7  # 7 days
+    GEOCODING_CACHE_STALE_TTL: int = 60 * 60 * 24  # 1 day
+    GEOCODING_NEGATIVE_CACHE_TTL: int = 60 * 60  # unknown cities, 1 hour
+
+    MEMORY_CACHE_MAX_ITEMS: int = 10_000
+    MEMORY_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 32 MiB per worker
+
+
+weather_service_config = WeatherServiceConfig()
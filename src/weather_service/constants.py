@@ -1,4 +1,16 @@
+from enum import Enum
+
+
 class ErrorCode:
     INVALID_RESPONSE = "Remote server provide invalid response."
     INVALID_TOKEN = "Invalid token."
     INVALID_SEARCH = "Invalid search request."
+    UPSTREAM_TIMEOUT = "Remote server didn't respond in time."
+    UPSTREAM_UNAVAILABLE = "Remote server is unavailable, try later."
+    UPSTREAM_RATE_LIMITED = "Remote server request quota is exhausted, try later."
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
@@ -0,0 +1,6 @@
+from src.weather_service import client
+from src.weather_service.client import Client
+
+
+async def get_weather_client() -> Client:
+    return Client(client.http_client)
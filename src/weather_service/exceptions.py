@@ -1,4 +1,9 @@
-from src.exceptions import ExternalError, NotAuthenticatedError, NotFoundError
+from src.exceptions import (
+    ExternalError,
+    NotAuthenticatedError,
+    NotFoundError,
+    ServiceUnavailableError,
+)
 from src.weather_service.constants import ErrorCode
 
 
@@ -12,3 +17,15 @@ class InvalidTokenError(NotAuthenticatedError):
 
 class InvalidSearchError(NotFoundError):
     error_code = ErrorCode.INVALID_SEARCH
+
+
+class UpstreamTimeoutError(ExternalError):
+    error_code = ErrorCode.UPSTREAM_TIMEOUT
+
+
+class UpstreamUnavailableError(ServiceUnavailableError):
+    error_code = ErrorCode.UPSTREAM_UNAVAILABLE
+
+
+class UpstreamRateLimitedError(ServiceUnavailableError):
+    error_code = ErrorCode.UPSTREAM_RATE_LIMITED
@@ -1,12 +1,19 @@
 from functools import wraps
 
-from fastapi import BackgroundTasks
-from fastapi.logger import logger
-from redis.exceptions import ConnectionError
+from pydantic import BaseModel
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.responses import Response
 
-from src.redis import RedisData, get_by_key, set_redis_key
+from src.exceptions import DetailedError, ErrorItem
+from src.weather_service.cache import build_cache_key, cached_call
+from src.weather_service.exceptions import InvalidResponseError, UpstreamTimeoutError
+
+
+class UncacheableResponseError(Exception):
+    """Carry a response, which must not be cached, out of the cache loader"""
+
+    def __init__(self, response: Response):
+        self.response = response
 
 
 def cache(seconds):
@@ -16,28 +23,43 @@ def cache(seconds):
             if not request:
                 return
 
-            params = request.query_params
-            key = f"{func.__name__}_{params}"
+            models = [arg for arg in kwargs.values() if isinstance(arg, BaseModel)]
+            key = build_cache_key(func.__name__, *models)
+
+            async def loader() -> str:
+                response: Response = await func(request, *args, **kwargs)
+                if "no-store" in response.headers.get("cache-control", ""):
+                    raise UncacheableResponseError(response)
+                return response.body.decode()
 
             try:
-                redis_data = await get_by_key(key)
-            except ConnectionError as er:
-                logger.error("Redis error %s:", er)
-            else:
-                if redis_data:
-                    return Response(
-                        content=redis_data,
-                        status_code=200,
-                        media_type="application/json",
-                    )
-
-            response: JSONResponse = await func(request, *args, **kwargs)
-            body: bytes = response.body
-            task = BackgroundTasks()
-            task.add_task(set_redis_key, RedisData(key=key, value=body, ttl=seconds))
-            response.background = task
-            return response
+                content = await cached_call(key, loader, seconds)
+            except UncacheableResponseError as er:
+                return er.response
+
+            return Response(
+                content=content,
+                status_code=200,
+                media_type="application/json",
+            )
 
         return wrapped
 
     return wrapper
+
+
+def to_detailed_error(exception: BaseException) -> DetailedError:
+    if isinstance(exception, DetailedError):
+        return exception
+    if isinstance(exception, TimeoutError):
+        return UpstreamTimeoutError(str(exception))
+    return InvalidResponseError(str(exception))
+
+
+def error_item(exception: BaseException, detail=None) -> ErrorItem:
+    error = to_detailed_error(exception)
+    return ErrorItem(
+        error_code=error.error_code,
+        error_message=error.error_message,
+        error_detail=detail,
+    )
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from fastapi.logger import logger
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+
+from src.redis import register_script
+from src.weather_service.config import weather_service_config
+from src.weather_service.exceptions import UpstreamRateLimitedError
+
+# Refill the bucket for the time passed since the last call and take up to
+# ARGV[3] tokens out of it, the granted tokens are added to the usage counter.
+# Redis clock is used, so every pod shares the same time.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+
+if granted > 0 then
+    redis.call('INCRBY', KEYS[2], granted)
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+end
+return granted
+"""
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket shared by every worker through redis. A worker leases a few
+    tokens at once and spends them locally, so most calls don't touch redis.
+    Calls wait up to max_wait seconds for a token and are shed after that.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        per_minute: int = weather_service_config.RATE_LIMIT_PER_MINUTE,
+        burst: int = weather_service_config.RATE_LIMIT_BURST,
+        lease: int = weather_service_config.RATE_LIMIT_LEASE,
+        max_wait: float = weather_service_config.RATE_LIMIT_MAX_WAIT,
+    ):
+        # the key itself must not end up in redis key names
+        self.key_id = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.lease = lease
+        self.max_wait = max_wait
+
+        self.granted = 0
+        self.queued = 0
+        self.shed = 0
+        self._tokens = 0
+        self._lock = asyncio.Lock()
+        self._script: AsyncScript | None = None
+
+    @property
+    def bucket_key(self) -> str:
+        return f"{weather_service_config.CACHE_KEY_PREFIX}:ratelimit:{self.key_id}"
+
+    def usage_key(self, moment: datetime) -> str:
+        return (
+            f"{weather_service_config.CACHE_KEY_PREFIX}:usage:{self.key_id}:"
+            f"{moment:%Y%m%d%H%M}"
+        )
+
+    async def _take_lease(self) -> int:
+        if self._script is None:
+            self._script = register_script(TOKEN_BUCKET_SCRIPT)
+
+        try:
+            return await self._script(
+                keys=[self.bucket_key, self.usage_key(datetime.now(timezone.utc))],
+                args=[
+                    self.burst,
+                    self.rate,
+                    self.lease,
+                    weather_service_config.RATE_LIMIT_USAGE_RETENTION,
+                ],
+            )
+        except RedisError as er:
+            # don't stop the service because of the limiter, fail open
+            logger.error("Redis error %s:", er)
+            return self.lease
+
+    async def acquire(self) -> None:
+        deadline = time.monotonic() + self.max_wait
+        queued = False
+        while True:
+            if self._tokens > 0:
+                self._tokens -= 1
+                self.granted += 1
+                return
+
+            async with self._lock:
+                if self._tokens == 0:
+                    self._tokens += await self._take_lease()
+            if self._tokens > 0:
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.shed += 1
+                raise UpstreamRateLimitedError("Remote server quota is exhausted")
+            if not queued:
+                queued = True
+                self.queued += 1
+            await asyncio.sleep(min(1 / self.rate, remaining))
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "granted": self.granted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "leased": self._tokens,
+        }
@@ -1,25 +1,26 @@
-import asyncio
-from asyncio import Task
 from typing import Annotated
 
 from fastapi import APIRouter, BackgroundTasks, Depends
-from fastapi.encoders import jsonable_encoder
 from fastapi.logger import logger
 from starlette import status
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
 from src.auth.jwt import parse_jwt_user_data
-from src.weather_service.client import Client
-from src.weather_service.exceptions import InvalidSearchError
+from src.responses import ModelResponse
+from src.weather_service import service
+from src.weather_service.cache import memory_cache
+from src.weather_service.client import Client, breakers, limiter
+from src.weather_service.dependencies import get_weather_client
 from src.weather_service.helper import cache
 from src.weather_service.schemas import (
     Coordinates,
-    Geocoding,
     GeocodingAPIResponse,
     Location,
     Weather,
     WeatherAPIResponse,
+    WeatherBatchRequest,
+    WeatherBatchResponse,
+    WeatherServiceHealth,
 )
 
 router = APIRouter(
@@ -33,14 +34,13 @@ router = APIRouter(
     response_model_exclude_none=True,
     status_code=status.HTTP_200_OK,
 )
-@cache(seconds=60)
 async def get_location(
     request: Request,
     loc: Annotated[Location, Depends()],
+    client: Annotated[Client, Depends(get_weather_client)],
 ):
-    client = Client()
-    response: GeocodingAPIResponse = await client.get_location(loc)
-    return JSONResponse(content=jsonable_encoder(response))
+    response: GeocodingAPIResponse = await service.get_location(client, loc)
+    return ModelResponse(response, by_alias=True)
 
 
 @router.get(
@@ -49,18 +49,13 @@ async def get_location(
     response_model_exclude_none=True,
     status_code=status.HTTP_200_OK,
 )
-@cache(seconds=60)
 async def get_weather_by_location(
     request: Request,
     coordinate: Annotated[Coordinates, Depends()],
+    client: Annotated[Client, Depends(get_weather_client)],
 ):
-    client = Client()
-    response: Weather = await client.get_weather(coordinate)
-    return JSONResponse(
-        content=jsonable_encoder(
-            response, exclude_unset=True, exclude_none=True, by_alias=True
-        )
-    )
+    response: Weather = await service.get_weather(client, coordinate)
+    return ModelResponse(response, exclude_unset=True, exclude_none=True, by_alias=True)
 
 
 @router.get(
@@ -73,32 +68,51 @@ async def get_weather_by_location(
 async def get_weather_by_location_name(
     request: Request,
     loc: Annotated[Location, Depends()],
+    client: Annotated[Client, Depends(get_weather_client)],
 ):
-    client = Client()
-    response: GeocodingAPIResponse = await client.get_location(loc)
-    entries: list[Geocoding] = response.entries
+    response: WeatherAPIResponse = await service.get_weather_by_location_name(
+        client, loc
+    )
+    json_response = ModelResponse(
+        response, context={}, exclude_unset=True, exclude_none=True, by_alias=True
+    )
+    if response.errors:
+        logger.error("Partial weather response for %s: %s", loc, response.errors)
+        json_response.headers["Cache-Control"] = "no-store"  # don't cache partial
+    return json_response
 
-    try:
-        async with asyncio.TaskGroup() as tg:
-            tasks: list[Task] = [
-                tg.create_task(
-                    client.get_weather(Coordinates(lat=geo.lat, lon=geo.lon)),
-                    name=f"Task-{geo.lat},{geo.lon}",
-                )
-                for geo in entries
-            ]
-    except ExceptionGroup as er:
-        logger.error(er.message)
-    except BaseExceptionGroup as er:
-        logger.error(er.message)
 
-    responses = [done.result() for done in tasks]
+@router.post(
+    "/weather/batch",
+    response_model=WeatherBatchResponse,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_200_OK,
+)
+async def get_weather_batch(
+    batch: WeatherBatchRequest,
+    client: Annotated[Client, Depends(get_weather_client)],
+):
+    results: list[WeatherAPIResponse] = await service.get_weather_batch(
+        client, batch.items
+    )
+
+    return ModelResponse(
+        WeatherBatchResponse(results=results),
+        context={},
+        exclude_unset=True,
+        exclude_none=True,
+        by_alias=True,
+    )
 
-    if len(responses) == 0:
-        raise InvalidSearchError("Remote server doesn't provide any results")
 
-    return JSONResponse(
-        content=WeatherAPIResponse(entries=responses).model_dump(
-            context={}, exclude_unset=True, exclude_none=True, by_alias=True
-        )
+@router.get(
+    "/health",
+    response_model=WeatherServiceHealth,
+    status_code=status.HTTP_200_OK,
+)
+async def get_health() -> WeatherServiceHealth:
+    return WeatherServiceHealth(
+        breakers={name: breaker.stats() for name, breaker in breakers.items()},
+        cache=memory_cache.stats(),
+        rate_limit=limiter.stats(),
     )
@@ -1,4 +1,5 @@
 import datetime
+from decimal import Decimal
 from typing import Annotated
 from zoneinfo import ZoneInfo
 
@@ -19,7 +20,10 @@ from pydantic_core.core_schema import (
 from pydantic_extra_types.coordinate import Latitude, Longitude
 from pydantic_extra_types.country import CountryAlpha2
 
+from src.exceptions import ErrorItem
 from src.models.models import CustomModel
+from src.weather_service.config import weather_service_config
+from src.weather_service.constants import BreakerState
 
 
 def convert_datetime_to_localtime(
@@ -45,6 +49,15 @@ class Coordinates(BaseModel):
     lon: Longitude
     lat: Latitude
 
+    def quantize(self, grid: float) -> "Coordinates":
+        """Snap the coordinates to the nearest node of a grid of the given step"""
+        # round to the decimal places of the step, 0.25 keeps two of them
+        digits = max(0, -Decimal(str(grid)).as_tuple().exponent)
+        return Coordinates(
+            lon=round(round(self.lon / grid) * grid, digits),
+            lat=round(round(self.lat / grid) * grid, digits),
+        )
+
 
 class Wind(BaseModel):
     speed: float | None = None
@@ -163,8 +176,36 @@ class GeocodingAPIResponse(BaseModel):
 
 class WeatherAPIResponse(BaseModel):
     entries: list[Weather]
+    errors: list[ErrorItem] | None = None
 
     @computed_field
     @property
     def count(self) -> int:
         return len(self.entries)
+
+
+class WeatherBatchRequest(BaseModel):
+    items: list[Location | Coordinates] = Field(
+        min_length=1, max_length=weather_service_config.WEATHER_BATCH_MAX_ITEMS
+    )
+
+
+class WeatherBatchResponse(BaseModel):
+    results: list[WeatherAPIResponse]
+
+    @computed_field
+    @property
+    def count(self) -> int:
+        return len(self.results)
+
+
+class BreakerStats(BaseModel):
+    state: BreakerState
+    calls: int
+    failure_rate: float
+
+
+class WeatherServiceHealth(BaseModel):
+    breakers: dict[str, BreakerStats]
+    cache: dict[str, int]
+    rate_limit: dict[str, int]
@@ -0,0 +1,223 @@
+import asyncio
+
+from src.weather_service.cache import build_cache_key, cached_call, cached_call_many
+from src.weather_service.client import Client
+from src.weather_service.config import weather_service_config
+from src.weather_service.exceptions import InvalidSearchError, UpstreamTimeoutError
+from src.weather_service.helper import error_item, to_detailed_error
+from src.weather_service.schemas import (
+    Coordinates,
+    GeocodingAPIResponse,
+    GeocodingList,
+    Location,
+    Weather,
+    WeatherAPIResponse,
+)
+
+
+def _geocoding_ttl(value: str) -> int:
+    if GeocodingList.model_validate_json(value):
+        return weather_service_config.GEOCODING_CACHE_TTL
+    return weather_service_config.GEOCODING_NEGATIVE_CACHE_TTL
+
+
+def _location_loader(client: Client, loc: Location, timeout: float | None = None):
+    async def loader() -> str:
+        return (await client.fetch_location(loc, timeout=timeout)).decode()
+
+    return loader
+
+
+async def get_location(client: Client, loc: Location) -> GeocodingAPIResponse:
+    """Geocode the location, results are cached for days, unknown cities for an hour"""
+    value = await cached_call(
+        build_cache_key("geocoding", loc),
+        _location_loader(client, loc),
+        _geocoding_ttl,
+        stale_ttl=weather_service_config.GEOCODING_CACHE_STALE_TTL,
+    )
+    return GeocodingAPIResponse(entries=GeocodingList.model_validate_json(value))
+
+
+async def get_locations(
+    client: Client,
+    locations: list[Location],
+    *,
+    concurrency: int | None = None,
+    deadline: float | None = None,
+) -> list[GeocodingAPIResponse | BaseException]:
+    """Geocode several locations at once, failed locations hold the exception"""
+    # upstream calls time out with the fan-out task, so the breaker sees them
+    task_timeout = weather_service_config.WEATHER_FAN_OUT_TASK_TIMEOUT
+    keys = [build_cache_key("geocoding", loc) for loc in locations]
+    loaders = {
+        key: _location_loader(client, loc, task_timeout)
+        for key, loc in zip(keys, locations, strict=True)
+    }
+
+    values, errors = await cached_call_many(
+        loaders,
+        _geocoding_ttl,
+        stale_ttl=weather_service_config.GEOCODING_CACHE_STALE_TTL,
+        concurrency=concurrency,
+        timeout=task_timeout,
+        deadline=deadline,
+    )
+    responses = {
+        key: GeocodingAPIResponse(entries=GeocodingList.model_validate_json(value))
+        for key, value in values.items()
+    }
+    return [responses[key] if key in responses else errors[key] for key in keys]
+
+
+def _weather_loader(
+    client: Client, coordinate: Coordinates, timeout: float | None = None
+):
+    async def loader() -> str:
+        return (await client.fetch_weather(coordinate, timeout=timeout)).decode()
+
+    return loader
+
+
+async def get_weather(client: Client, coordinate: Coordinates) -> Weather:
+    """Current weather, cached per coordinates snapped to the cache grid"""
+    coordinate = coordinate.quantize(weather_service_config.CACHE_COORDINATE_GRID)
+    value = await cached_call(
+        build_cache_key("weather", coordinate),
+        _weather_loader(client, coordinate),
+        weather_service_config.WEATHER_CACHE_TTL,
+    )
+    return Weather.model_validate_json(value)
+
+
+async def get_weathers(
+    client: Client,
+    coordinates: list[Coordinates],
+    *,
+    concurrency: int | None = None,
+    deadline: float | None = None,
+) -> list[Weather | BaseException]:
+    """
+    Current weather for several coordinates, cached entries are read at once
+    and only the missed coordinates are requested from the remote server.
+    Failed coordinates hold the exception.
+    """
+    grid = weather_service_config.CACHE_COORDINATE_GRID
+    task_timeout = weather_service_config.WEATHER_FAN_OUT_TASK_TIMEOUT
+    keys: list[str] = []
+    loaders = {}
+    for coordinate in coordinates:
+        coordinate = coordinate.quantize(grid)
+        key = build_cache_key("weather", coordinate)
+        keys.append(key)
+        loaders[key] = _weather_loader(client, coordinate, task_timeout)
+
+    values, errors = await cached_call_many(
+        loaders,
+        weather_service_config.WEATHER_CACHE_TTL,
+        concurrency=concurrency,
+        timeout=task_timeout,
+        deadline=deadline,
+    )
+    weathers = {
+        key: Weather.model_validate_json(value) for key, value in values.items()
+    }
+    return [weathers[key] if key in weathers else errors[key] for key in keys]
+
+
+def _weather_response(
+    coordinates: list[Coordinates], results: list[Weather | BaseException]
+) -> WeatherAPIResponse:
+    entries = [result for result in results if isinstance(result, Weather)]
+    errors = [
+        error_item(result, detail=coordinate.model_dump())
+        for coordinate, result in zip(coordinates, results, strict=True)
+        if not isinstance(result, Weather)
+    ]
+    return WeatherAPIResponse(entries=entries, errors=errors or None)
+
+
+async def get_weather_by_location_name(
+    client: Client, loc: Location
+) -> WeatherAPIResponse:
+    """
+    Current weather for every geocoding entry of the location, within the
+    request budget. Entries which failed or ran out of the budget are
+    reported in errors, the request fails only if no entry succeeded.
+    """
+    deadline = (
+        asyncio.get_running_loop().time()
+        + weather_service_config.WEATHER_FAN_OUT_BUDGET
+    )
+    try:
+        async with asyncio.timeout_at(deadline):
+            geocoding = await get_location(client, loc)
+    except TimeoutError as er:
+        raise UpstreamTimeoutError("Geocoding is out of the request budget") from er
+
+    coordinates = [Coordinates(lat=geo.lat, lon=geo.lon) for geo in geocoding.entries]
+    results = await get_weathers(
+        client,
+        coordinates,
+        concurrency=weather_service_config.WEATHER_FAN_OUT_CONCURRENCY,
+        deadline=deadline,
+    )
+    if not any(isinstance(result, Weather) for result in results):
+        if results:
+            raise to_detailed_error(results[0])
+        raise InvalidSearchError("Remote server doesn't provide any results")
+
+    return _weather_response(coordinates, results)
+
+
+async def get_weather_batch(
+    client: Client, items: list[Location | Coordinates]
+) -> list[WeatherAPIResponse]:
+    """
+    Current weather for a mix of locations and coordinates, every location
+    resolves to the weather of all its geocoding entries. Failures are
+    reported per item.
+    """
+    concurrency = weather_service_config.WEATHER_BATCH_CONCURRENCY
+    deadline = (
+        asyncio.get_running_loop().time() + weather_service_config.WEATHER_BATCH_BUDGET
+    )
+    locations = [item for item in items if isinstance(item, Location)]
+    geocoding = iter(
+        await get_locations(
+            client, locations, concurrency=concurrency, deadline=deadline
+        )
+    )
+
+    item_coordinates: list[list[Coordinates]] = []
+    item_errors: dict[int, BaseException] = {}
+    for i, item in enumerate(items):
+        if isinstance(item, Coordinates):
+            item_coordinates.append([item])
+            continue
+
+        result = next(geocoding)
+        if isinstance(result, BaseException):
+            item_errors[i] = result
+            item_coordinates.append([])
+        else:
+            item_coordinates.append(
+                [Coordinates(lat=geo.lat, lon=geo.lon) for geo in result.entries]
+            )
+
+    weathers = iter(
+        await get_weathers(
+            client,
+            [coordinate for batch in item_coordinates for coordinate in batch],
+            concurrency=concurrency,
+            deadline=deadline,
+        )
+    )
+    responses: list[WeatherAPIResponse] = []
+    for i, (item, batch) in enumerate(zip(items, item_coordinates, strict=True)):
+        if i in item_errors:
+            error = error_item(item_errors[i], detail=item.model_dump())
+            responses.append(WeatherAPIResponse(entries=[], errors=[error]))
+        else:
+            responses.append(_weather_response(batch, [next(weathers) for _ in batch]))
+    return responses
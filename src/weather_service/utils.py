@@ -0,0 +1,50 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+async def fan_out(
+    calls: dict[str, Callable[[], Awaitable[Any]]],
+    *,
+    concurrency: int | None = None,
+    timeout: float | None = None,
+    deadline: float | None = None,
+) -> tuple[dict[str, Any], dict[str, BaseException]]:
+    """
+    Run the calls concurrently and return their results and errors by key.
+    At most concurrency calls run at once, each one is limited by timeout
+    seconds, and whatever isn't done by the deadline (event loop time)
+    is cancelled and reported as TimeoutError, so one slow call
+    never holds the others.
+    """
+    semaphore = asyncio.Semaphore(concurrency or max(len(calls), 1))
+
+    async def run(func: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore, asyncio.timeout(timeout):
+            return await func()
+
+    tasks = {
+        key: asyncio.create_task(run(func), name=f"Task-{key}")
+        for key, func in calls.items()
+    }
+    budget = None
+    if deadline is not None:
+        budget = max(deadline - asyncio.get_running_loop().time(), 0)
+
+    try:
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=budget)
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    results: dict[str, Any] = {}
+    errors: dict[str, BaseException] = {}
+    for key, task in tasks.items():
+        if task.cancelled():
+            errors[key] = TimeoutError(f"{key} is out of the request budget")
+        elif task.exception() is not None:
+            errors[key] = task.exception()
+        else:
+            results[key] = task.result()
+    return results, errors
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+import pytest
+
+from src.auth import jwt
+from src.auth.exceptions import InvalidTokenError
+
+USER = {"id": 1, "is_admin": False}
+
+
+@pytest.fixture(autouse=True)
+def clear_verified_tokens() -> None:
+    jwt._verified_tokens.clear()
+
+
+async def test_verified_token_is_cached() -> None:
+    token = jwt.create_access_token(user=USER)
+
+    first = await jwt.parse_jwt_user_data_optional(token)
+    second = await jwt.parse_jwt_user_data_optional(token)
+
+    assert first.user_id == 1
+    assert second is first
+
+
+async def test_expired_cached_token_is_rejected() -> None:
+    token = jwt.create_access_token(user=USER)
+    jwt_data = await jwt.parse_jwt_user_data_optional(token)
+    jwt._verified_tokens[token] = jwt_data.model_copy(
+        update={"expired_at": jwt_data.expired_at - timedelta(days=1)},
+    )
+
+    assert jwt._get_verified_token(token) is None
+    assert token not in jwt._verified_tokens
+
+
+async def test_verified_tokens_are_bounded(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(jwt.auth_config, "JWT_CACHE_MAX_ITEMS", 2)
+    tokens = [
+        jwt.create_access_token(user={"id": user_id, "is_admin": False})
+        for user_id in range(3)
+    ]
+
+    for token in tokens:
+        await jwt.parse_jwt_user_data_optional(token)
+
+    assert list(jwt._verified_tokens) == tokens[1:]
+
+
+async def test_invalid_token_is_not_cached() -> None:
+    with pytest.raises(InvalidTokenError):
+        await jwt.parse_jwt_user_data_optional("not-a-token")
+
+    assert not jwt._verified_tokens
+
+
+async def test_pyjwt_backend(monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("jwt")
+    monkeypatch.setattr(jwt.auth_config, "JWT_BACKEND", "pyjwt")
+    token = jwt.create_access_token(user=USER)
+
+    assert jwt.decode_token(token)["sub"] == "1"
+    with pytest.raises(InvalidTokenError):
+        jwt.decode_token(token + "x")
@@ -0,0 +1,110 @@
+from pathlib import Path
+
+import pytest
+from async_asgi_testclient import TestClient
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from src.auth import jwt, keys
+from src.auth.exceptions import InvalidTokenError
+
+USER = {"id": 1, "is_admin": False}
+
+
+def es256_key(kid: str) -> keys.SigningKey:
+    return keys.SigningKey(kid, ec.generate_private_key(ec.SECP256R1()))
+
+
+@pytest.fixture(autouse=True)
+def keyring(monkeypatch: pytest.MonkeyPatch) -> keys.KeyRing:
+    ring = keys.KeyRing([es256_key("old"), es256_key("new")], active="old")
+    monkeypatch.setattr(keys, "keyring", ring)
+    return ring
+
+
+def test_token_signed_with_active_key() -> None:
+    token = jwt.create_access_token(user=USER)
+
+    assert jwt.jwt.get_unverified_header(token)["kid"] == "old"
+    assert jwt.decode_token(token)["sub"] == "1"
+
+
+def test_rotation(keyring: keys.KeyRing) -> None:
+    old_token = jwt.create_access_token(user=USER)
+    keyring.activate("new")
+    new_token = jwt.create_access_token(user=USER)
+
+    assert jwt.jwt.get_unverified_header(new_token)["kid"] == "new"
+    assert jwt.decode_token(old_token)["sub"] == "1"
+
+    keyring.retire("old")
+    with pytest.raises(InvalidTokenError):
+        jwt.decode_token(old_token)
+    assert jwt.decode_token(new_token)["sub"] == "1"
+
+
+def test_active_key_cannot_be_retired(keyring: keys.KeyRing) -> None:
+    with pytest.raises(ValueError):
+        keyring.retire("old")
+
+
+def test_jwks_is_rebuilt_on_change(keyring: keys.KeyRing) -> None:
+    jwks = keyring.jwks()
+
+    assert [key["kid"] for key in jwks["keys"]] == ["old", "new"]
+    assert keyring.jwks() is jwks
+    assert all("d" not in key for key in jwks["keys"])
+
+    keyring.activate("new")
+    keyring.retire("old")
+    assert [key["kid"] for key in keyring.jwks()["keys"]] == ["new"]
+
+
+def test_eddsa_with_pyjwt(
+    monkeypatch: pytest.MonkeyPatch, keyring: keys.KeyRing
+) -> None:
+    monkeypatch.setattr(jwt.auth_config, "JWT_BACKEND", "pyjwt")
+    keyring.add(keys.SigningKey("ed", ed25519.Ed25519PrivateKey.generate()))
+    keyring.activate("ed")
+
+    token = jwt.create_access_token(user=USER)
+
+    assert jwt.decode_token(token)["sub"] == "1"
+    assert keyring.jwks()["keys"][-1]["kty"] == "OKP"
+
+
+def test_load_keyring(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    for kid in ("2024-01-01", "2024-06-01"):
+        pem = ec.generate_private_key(ec.SECP256R1()).private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        (tmp_path / f"{kid}.pem").write_bytes(pem)
+    monkeypatch.setattr(keys.auth_config, "JWT_KEYS_DIR", str(tmp_path))
+
+    ring = keys.load_keyring()
+
+    assert ring.active.kid == "2024-06-01"
+    assert ring.get("2024-01-01").alg == "ES256"
+
+
+def test_load_keyring_needs_pyjwt_backend_installed(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def missing_pyjwt() -> None:
+        raise ModuleNotFoundError("No module named 'jwt'")
+
+    monkeypatch.setattr(keys.auth_config, "JWT_BACKEND", "pyjwt")
+    monkeypatch.setattr(jwt, "_pyjwt", missing_pyjwt)
+
+    with pytest.raises(ModuleNotFoundError):
+        keys.load_keyring()
+
+
+async def test_jwks_route(client: TestClient) -> None:
+    resp = await client.get("/auth/.well-known/jwks.json")
+
+    assert resp.status_code == 200
+    assert resp.headers["Cache-Control"].startswith("public, max-age=")
+    assert [key["kid"] for key in resp.json()["keys"]] == ["old", "new"]
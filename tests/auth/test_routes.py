@@ -1,8 +1,16 @@
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+
 import pytest
 from async_asgi_testclient import TestClient
 from fastapi import status
 
+from src.auth.config import auth_config
 from src.auth.constants import ErrorCode
+from src.auth.jwt import validate_admin_access
+from src.database import get_connection
+from src.main import app
 from tests.conftest import idtype
 
 
@@ -37,15 +45,165 @@ async def test_rates(client: TestClient, params) -> None:
 async def test_register_email_taken(
     client: TestClient, monkeypatch: pytest.MonkeyPatch, params
 ) -> None:
-    from src.auth.dependencies import service
+    from src.auth import service
 
-    async def fake_getter(*args, **kwargs):
-        return True
+    async def fake_insert(*args, **kwargs):
+        return None  # ON CONFLICT DO NOTHING returned no row
 
-    monkeypatch.setattr(service, "get_user_by_email", fake_getter)
+    monkeypatch.setattr(service, "fetch_one", fake_insert)
 
     resp = await client.post("/auth/users", json=params)
     resp_json = resp.json()
 
     assert resp.status_code == status.HTTP_400_BAD_REQUEST
     assert resp_json["error"]["error_code"] == ErrorCode.EMAIL_TAKEN
+
+
+def fake_user(user_id: int) -> dict:
+    return {
+        "id": user_id,
+        "email": f"user{user_id}@email.com",
+        "password": "hash",
+        "is_admin": False,
+        "created_at": datetime(2024, 1, 1),
+        "updated_at": None,
+    }
+
+
+@pytest.fixture
+def admin_access(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def allow() -> None:
+        return None
+
+    monkeypatch.setitem(app.dependency_overrides, validate_admin_access, allow)
+
+
+async def test_users_page(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch, admin_access
+) -> None:
+    from src.auth import service
+
+    async def fake_page(*, after: int | None, limit: int) -> list[dict]:
+        first = (after or 0) + 1
+        return [fake_user(user_id) for user_id in range(first, first + limit)]
+
+    monkeypatch.setattr(service, "get_users_page", fake_page)
+
+    resp = await client.get("/auth/users/get", query_string={"limit": 2, "after": 5})
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["X-Next-Cursor"] == "7"
+    assert [user["id"] for user in resp.json()] == [6, 7]
+    assert "password" not in resp.json()[0]
+
+
+async def test_users_stream(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch, admin_access
+) -> None:
+    from src.auth import service
+
+    async def fake_stream(*, after: int | None):
+        for user_id in range(after + 1, after + 4):
+            yield fake_user(user_id)
+
+    monkeypatch.setattr(service, "stream_users", fake_stream)
+
+    resp = await client.get("/auth/users/get", query_string={"stream": 1, "after": 2})
+    lines = resp.text.splitlines()
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["Content-Type"] == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in lines] == [3, 4, 5]
+    assert "updated_at" not in lines[0]
+
+
+async def no_connection():
+    yield None
+
+
+async def test_users_batch_create(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch, admin_access
+) -> None:
+    from src.auth import service
+
+    statements = []
+
+    async def fake_hash(passwords: list[str]) -> list[str]:
+        return [f"hash-{password}" for password in passwords]
+
+    async def fake_insert(query, connection, parameters) -> list[dict]:
+        assert connection is None  # no request connection held while hashing
+        statements.append((query, parameters))
+        return [fake_user(1)]
+
+    monkeypatch.setattr(service, "hash_passwords_async", fake_hash)
+    monkeypatch.setattr(service, "fetch_all", fake_insert)
+
+    resp = await client.post(
+        "/auth/users/batch",
+        json=[
+            {"email": "user1@email.com", "password": "P@$$w0rd1"},
+            {"email": "taken@email.com", "password": "P@$$w0rd2", "is_admin": True},
+        ],
+    )
+
+    assert resp.status_code == status.HTTP_201_CREATED
+    assert [user["id"] for user in resp.json()] == [1]
+    assert len(statements) == 1
+    query, parameters = statements[0]
+    assert query is service.insert_users
+    assert parameters["emails"] == ["user1@email.com", "taken@email.com"]
+    assert parameters["passwords"] == ["hash-P@$$w0rd1", "hash-P@$$w0rd2"]
+    assert parameters["is_admins"] == [False, True]
+
+
+async def test_update_user_password_hashed_without_connection(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch, admin_access
+) -> None:
+    from src.auth import service
+
+    events = []
+
+    async def fake_hash(password: str) -> str:
+        events.append("hash")
+        return f"hash-{password}"
+
+    @asynccontextmanager
+    async def fake_begin():
+        events.append("begin")
+        yield None
+
+    async def fake_update(query, connection) -> dict:
+        events.append("update")
+        return {**fake_user(1), "time_at": None}
+
+    async def fake_expire(user_id: int, *, connection=None) -> None:
+        events.append("expire")
+
+    async def fake_cache_write(*args) -> None:
+        pass
+
+    monkeypatch.setattr(service, "hash_password_async", fake_hash)
+    monkeypatch.setattr(service, "begin", fake_begin)
+    monkeypatch.setattr(service, "fetch_one", fake_update)
+    monkeypatch.setattr(service, "expire_user_refresh_tokens", fake_expire)
+    monkeypatch.setattr(service.user_cache, "write", fake_cache_write)
+
+    resp = await client.patch("/auth/1/update", json={"password": "Pa$$w0rd!"})
+
+    assert resp.status_code == status.HTTP_200_OK
+    # no connection is held while bcrypt runs
+    assert events == ["hash", "begin", "update", "expire"]
+
+
+async def test_users_batch_too_large(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch, admin_access
+) -> None:
+    monkeypatch.setitem(app.dependency_overrides, get_connection, no_connection)
+
+    resp = await client.delete(
+        "/auth/users/batch",
+        json={"ids": list(range(auth_config.USERS_BATCH_MAX_SIZE + 1))},
+    )
+
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,36 @@
+import pytest
+
+from src.auth import security
+from src.auth.exceptions import PasswordHasherBusyError
+
+
+async def test_hash_password_async_roundtrip() -> None:
+    hashed = await security.hash_password_async("P@$$w0rd123!")
+
+    assert await security.check_password_async("P@$$w0rd123!", hashed)
+    assert not await security.check_password_async("WrongP@$$w0rd1", hashed)
+
+
+async def test_hasher_pool_saturated(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(security.auth_config, "PASSWORD_HASHER_MAX_PENDING", 0)
+
+    with pytest.raises(PasswordHasherBusyError):
+        await security.hash_password_async("P@$$w0rd123!")
+
+
+async def test_hash_passwords_async_stays_under_pending_limit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(security.auth_config, "PASSWORD_HASH_ROUNDS", 4)
+    monkeypatch.setattr(
+        security.auth_config,
+        "PASSWORD_HASHER_MAX_PENDING",
+        security.auth_config.PASSWORD_HASHER_WORKERS,
+    )
+    passwords = [f"P@$$w0rd{i}" for i in range(10)]
+
+    hashed = await security.hash_passwords_async(passwords)
+
+    assert [
+        security.check_password(pw, h) for pw, h in zip(passwords, hashed, strict=False)
+    ] == [True] * len(passwords)
@@ -0,0 +1,166 @@
+from datetime import datetime
+from typing import Any, AsyncGenerator, Callable
+
+import pytest
+from async_asgi_testclient import TestClient
+from fastapi import status
+
+from src.auth import service, token_store
+from src.auth.constants import ErrorCode
+from src.auth.exceptions import RefreshTokenNotValidError
+from src.auth.utils import hash_token
+from src.database import get_connection
+from src.main import app
+
+
+class MemoryRefreshTokenStore(token_store.RefreshTokenStore):
+    def __init__(self) -> None:
+        self.tokens: dict[str, dict[str, Any]] = {}
+
+    def _add(self, token: dict[str, Any]) -> dict[str, Any]:
+        self.tokens[token["token_hash"]] = {**token, "rotated_at": None}
+        return token
+
+    async def create(
+        self, user_id: int, refresh_token: str, *, connection: Any = None
+    ) -> dict[str, Any]:
+        return self._add(token_store._new_refresh_token(user_id, refresh_token))
+
+    async def get(
+        self, refresh_token: str, *, connection: Any = None
+    ) -> dict[str, Any] | None:
+        return self.tokens.get(hash_token(refresh_token))
+
+    async def rotate(
+        self,
+        refresh_token: dict[str, Any],
+        new_refresh_token: str,
+        *,
+        connection: Any = None,
+    ) -> dict[str, Any] | None:
+        old = self.tokens.get(refresh_token["token_hash"])
+        if old is None or old["rotated_at"]:
+            return None
+        old["rotated_at"] = datetime.now()
+        return self._add(
+            token_store._new_refresh_token(
+                refresh_token["user_id"], new_refresh_token, refresh_token["family_id"]
+            )
+        )
+
+    async def expire(
+        self, refresh_token: dict[str, Any], *, connection: Any = None
+    ) -> None:
+        self.tokens.pop(refresh_token["token_hash"], None)
+
+    async def expire_family(
+        self, refresh_token: dict[str, Any], *, connection: Any = None
+    ) -> None:
+        self._drop(lambda token: token["family_id"] == refresh_token["family_id"])
+
+    async def expire_user(self, user_id: int, *, connection: Any = None) -> None:
+        self._drop(lambda token: token["user_id"] == user_id)
+
+    def _drop(self, predicate: Callable[[dict[str, Any]], bool]) -> None:
+        self.tokens = {
+            key: token for key, token in self.tokens.items() if not predicate(token)
+        }
+
+
+async def no_connection() -> AsyncGenerator[None, None]:
+    yield None
+
+
+@pytest.fixture
+def store(monkeypatch: pytest.MonkeyPatch) -> MemoryRefreshTokenStore:
+    monkeypatch.setitem(app.dependency_overrides, get_connection, no_connection)
+    memory_store = MemoryRefreshTokenStore()
+    monkeypatch.setattr(service, "refresh_token_store", memory_store)
+
+    async def fake_user(user_id: int, *, connection: Any = None) -> dict[str, Any]:
+        return {"id": user_id, "is_admin": False}
+
+    monkeypatch.setattr(service, "get_user_profile", fake_user)
+    return memory_store
+
+
+async def test_refresh_token_rotation(
+    client: TestClient, store: MemoryRefreshTokenStore
+) -> None:
+    refresh_token = await service.create_refresh_token(user_id=1)
+
+    resp = await client.put(
+        "/auth/users/tokens", cookies={"refreshToken": refresh_token}
+    )
+    new_refresh_token = resp.json()["refresh_token"]
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert (await service.get_refresh_token(refresh_token))["rotated_at"]
+    assert (await service.get_refresh_token(new_refresh_token))["rotated_at"] is None
+
+
+async def test_rotated_refresh_token_reuse_revokes_family(
+    client: TestClient, store: MemoryRefreshTokenStore
+) -> None:
+    refresh_token = await service.create_refresh_token(user_id=1)
+    other_session = await service.create_refresh_token(user_id=1)
+    resp = await client.put(
+        "/auth/users/tokens", cookies={"refreshToken": refresh_token}
+    )
+    new_refresh_token = resp.json()["refresh_token"]
+
+    resp = await client.put(
+        "/auth/users/tokens", cookies={"refreshToken": refresh_token}
+    )
+
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+    assert resp.json()["error"]["error_code"] == ErrorCode.REFRESH_TOKEN_NOT_VALID
+    assert await service.get_refresh_token(new_refresh_token) is None
+    assert await service.get_refresh_token(other_session) is not None
+
+
+async def test_refresh_token_reused_concurrently(
+    store: MemoryRefreshTokenStore,
+) -> None:
+    await service.create_refresh_token(user_id=1, refresh_token="token")
+    refresh_token = await service.get_refresh_token("token")
+
+    await service.rotate_refresh_token(refresh_token)
+    with pytest.raises(RefreshTokenNotValidError):
+        await service.rotate_refresh_token(refresh_token)
+
+
+async def test_expire_user_refresh_tokens(store: MemoryRefreshTokenStore) -> None:
+    await service.create_refresh_token(user_id=1)
+    await service.create_refresh_token(user_id=1)
+    await service.create_refresh_token(user_id=2)
+
+    await service.expire_user_refresh_tokens(1)
+
+    assert [token["user_id"] for token in store.tokens.values()] == [2]
+
+
+async def test_purge_expired_refresh_tokens(monkeypatch: pytest.MonkeyPatch) -> None:
+    batches = [5, 5, 2]
+    statements = []
+
+    async def fake_execute(query) -> int:
+        statements.append(query)
+        return batches[len(statements) - 1]
+
+    monkeypatch.setattr(service, "execute", fake_execute)
+
+    deleted, elapsed = await service.purge_expired_refresh_tokens(batch_size=5, pause=0)
+
+    assert deleted == 12
+    assert len(statements) == 3
+    assert elapsed >= 0
+
+
+def test_incomplete_store_fails_on_instantiation() -> None:
+    class IncompleteStore(token_store.RefreshTokenStore):
+        async def create(self, user_id: int, refresh_token: str, **kwargs: Any) -> Any:
+            return {}
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
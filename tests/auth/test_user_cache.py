@@ -0,0 +1,110 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncGenerator
+
+import pytest
+
+from src import redis
+from src.auth import service, user_cache
+from src.auth.schemas import UpdateUser
+
+
+class FakeBinaryRedis:
+    def __init__(self) -> None:
+        self.keys: dict[str, bytes] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.keys.get(key)
+
+    async def set(self, key: str, value: bytes, ex: int, nx: bool = False) -> None:
+        if not (nx and key in self.keys):
+            self.keys[key] = value
+
+
+def db_user(**fields: Any) -> dict[str, Any]:
+    return {
+        "id": 1,
+        "email": "user@mail.com",
+        "password": "hash",
+        "is_admin": False,
+        "created_at": datetime(2024, 6, 1, 12, 30, 15, 123456),
+        "updated_at": None,
+        "time_at": None,
+        **fields,
+    }
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> FakeBinaryRedis:
+    fake_redis = FakeBinaryRedis()
+    monkeypatch.setattr(redis, "redis_binary_client", fake_redis)
+    return fake_redis
+
+
+def test_profile_roundtrip() -> None:
+    profile = user_cache.profile(db_user())
+
+    assert user_cache.loads(user_cache.dumps(profile)) == profile
+    assert "password" not in profile
+    assert user_cache.loads(user_cache.dumps(None)) is None
+
+
+async def test_profile_cached_and_written_through(
+    cache: FakeBinaryRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    reads = []
+
+    async def fake_get_user_by_id(user_id: int, *, connection: Any = None) -> dict:
+        reads.append(user_id)
+        return db_user()
+
+    async def fake_update(*args: Any, **kwargs: Any) -> dict[str, Any]:
+        return db_user(is_admin=True)
+
+    @asynccontextmanager
+    async def no_transaction() -> AsyncGenerator[None, None]:
+        yield None
+
+    monkeypatch.setattr(service, "get_user_by_id", fake_get_user_by_id)
+    monkeypatch.setattr(service, "fetch_one", fake_update)
+    monkeypatch.setattr(service, "begin", no_transaction)
+
+    assert (await service.get_user_profile(1))["is_admin"] is False
+    assert (await service.get_user_profile(1))["is_admin"] is False
+    await service.update_user(1, UpdateUser(is_admin=True))
+
+    assert (await service.get_user_profile(1))["is_admin"] is True
+    assert reads == [1]
+
+
+async def test_deleted_user_not_read_again(
+    cache: FakeBinaryRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def fake_execute(*args: Any, **kwargs: Any) -> int:
+        return 1
+
+    async def fake_expire_user(user_id: int, *, connection: Any = None) -> None:
+        pass
+
+    monkeypatch.setattr(service, "execute", fake_execute)
+    monkeypatch.setattr(service, "expire_user_refresh_tokens", fake_expire_user)
+    monkeypatch.setattr(service, "get_user_by_id", None)  # must not be called
+
+    await service.delete_user(1)
+
+    assert await service.get_user_profile(1) is None
+
+
+async def test_missing_user_not_cached(
+    cache: FakeBinaryRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    users: list[dict[str, Any] | None] = [None, db_user()]
+
+    async def fake_get_user_by_id(user_id: int, *, connection: Any = None) -> Any:
+        return users.pop(0)  # the replica caught up with the sign-up
+
+    monkeypatch.setattr(service, "get_user_by_id", fake_get_user_by_id)
+
+    assert await service.get_user_profile(1) is None
+    assert not cache.keys
+    assert (await service.get_user_profile(1))["email"] == "user@mail.com"
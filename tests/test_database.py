@@ -0,0 +1,169 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator
+
+import pytest
+
+from src import database, redis
+
+
+class FakeCursor:
+    rowcount = 3
+
+    def first(self) -> None:
+        return None
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.queries: list[Any] = []
+        self.parameters: list[Any] = []
+
+    async def execute(self, query: Any, parameters: Any = None) -> FakeCursor:
+        self.queries.append(query)
+        self.parameters.append(parameters)
+        return FakeCursor()
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeEngine:
+    url = "postgresql+asyncpg://fake"
+
+    def __init__(self, *, down: bool = False) -> None:
+        self.down = down
+        self.connection = FakeConnection()
+
+    async def connect(self) -> FakeConnection:
+        if self.down:
+            raise ConnectionRefusedError()
+        return self.connection
+
+    @asynccontextmanager
+    async def begin(self) -> AsyncGenerator[FakeConnection, None]:
+        yield self.connection
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.keys: dict[str, Any] = {}
+
+    async def set(self, key: str, value: Any, ex: int) -> None:
+        self.keys[key] = value
+
+    async def exists(self, key: str) -> int:
+        return int(key in self.keys)
+
+
+@pytest.fixture
+def replicated(monkeypatch: pytest.MonkeyPatch) -> tuple[FakeEngine, FakeEngine]:
+    primary, replica = FakeEngine(), FakeEngine()
+    monkeypatch.setattr(database, "engine", primary)
+    monkeypatch.setattr(database, "replica_engines", [replica])
+    monkeypatch.setattr(database, "unhealthy_replicas", set())
+    monkeypatch.setattr(redis, "redis_client", FakeRedis())
+    return primary, replica
+
+
+async def test_helpers_reuse_given_connection(monkeypatch: pytest.MonkeyPatch) -> None:
+    # checking out a new connection would fail
+    monkeypatch.setattr(database, "engine", None)
+    connection = FakeConnection()
+    select_query = database.auth_user.select()
+    delete_query = database.auth_user.delete()
+
+    assert await database.fetch_one(select_query, connection) is None
+    assert await database.execute(delete_query, connection) == 3
+    assert connection.queries == [select_query, delete_query]
+
+
+async def test_user_lookups_reuse_built_statements(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    from src.auth import service
+
+    monkeypatch.setattr(database, "engine", None)
+    connection = FakeConnection()
+
+    await service.get_user_by_id(7, connection=connection)
+    await service.get_user_by_email("Some@Mail.com", connection=connection)
+
+    assert connection.queries == [
+        service.select_user_by_id,
+        service.select_user_by_email,
+    ]
+    assert connection.parameters == [{"user_id": 7}, {"email": "some@mail.com"}]
+
+
+async def test_reads_go_to_replicas(replicated: tuple[FakeEngine, FakeEngine]) -> None:
+    primary, replica = replicated
+    select_query = database.auth_user.select()
+    locking_query = database.auth_user.select().with_for_update()
+    insert_query = database.auth_user.insert().returning(database.auth_user)
+
+    await database.fetch_one(select_query)
+    await database.fetch_one(locking_query)
+    await database.fetch_one(insert_query)
+
+    assert replica.connection.queries == [select_query]
+    assert primary.connection.queries == [locking_query, insert_query]
+
+
+async def test_replica_down_falls_back_to_primary(
+    replicated: tuple[FakeEngine, FakeEngine],
+) -> None:
+    primary, replica = replicated
+    replica.down = True
+    select_query = database.auth_user.select()
+
+    await database.fetch_one(select_query)
+
+    assert primary.connection.queries == [select_query]
+    assert database.unhealthy_replicas == {replica}
+
+
+async def test_user_reads_primary_after_write(
+    replicated: tuple[FakeEngine, FakeEngine],
+) -> None:
+    primary, replica = replicated
+    select_query = database.auth_user.select()
+
+    async def request(user_id: int, query: Any) -> None:
+        database.set_request_user(user_id)
+        await database.fetch_one(query)
+
+    # every request runs in its own context
+    await asyncio.create_task(request(1, database.auth_user.update()))
+    await asyncio.create_task(request(1, select_query))
+    await asyncio.create_task(request(2, select_query))
+
+    assert primary.connection.queries[1:] == [select_query]
+    assert replica.connection.queries == [select_query]
+
+
+async def test_after_commit_runs_only_on_commit(
+    replicated: tuple[FakeEngine, FakeEngine],
+) -> None:
+    calls: list[str] = []
+
+    async def callback() -> None:
+        calls.append("committed")
+
+    dependency = database.get_connection()
+    connection = await anext(dependency)
+    await database.after_commit(connection, callback)
+    assert calls == []
+    with pytest.raises(StopAsyncIteration):
+        await anext(dependency)
+    assert calls == ["committed"]
+
+    dependency = database.get_connection()
+    connection = await anext(dependency)
+    await database.after_commit(connection, callback)
+    with pytest.raises(ValueError):
+        await dependency.athrow(ValueError())
+    assert calls == ["committed"]
+
+    await database.after_commit(None, callback)
+    assert calls == ["committed", "committed"]
@@ -0,0 +1,48 @@
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from starlette.responses import JSONResponse
+
+from src.exceptions import ErrorItem, ErrorResponse
+from src.responses import ModelResponse
+from src.weather_service.schemas import Coordinates, Weather, WeatherAPIResponse
+from tests.weather_service.test_service import weather_payload
+
+
+def weather() -> Weather:
+    payload = weather_payload(Coordinates(lat=55.75, lon=37.62))
+    return Weather(
+        **{**payload, "offset_seconds": 10800, "rain": {"1h": 0.25}, "name": "Москва"}
+    )
+
+
+def test_model_response_matches_json_response() -> None:
+    response = WeatherAPIResponse(
+        entries=[weather()], errors=[ErrorItem(error_code="X", error_message="y")]
+    )
+    options = {"exclude_unset": True, "exclude_none": True, "by_alias": True}
+
+    old = JSONResponse(content=response.model_dump(context={}, **options))
+    new = ModelResponse(response, context={}, **options)
+
+    assert new.body == old.body
+    assert new.headers["content-type"] == old.headers["content-type"]
+    assert json.loads(new.body)["entries"][0]["dt"] == "2024-05-29T19:26:40+0300"
+
+
+def test_model_response_matches_jsonable_encoder() -> None:
+    error = ErrorResponse(error=ErrorItem(error_code="X", error_message="y"))
+    options = {"exclude_none": True, "exclude_unset": True}
+
+    old = JSONResponse(content=jsonable_encoder(error, **options), status_code=400)
+    new = ModelResponse(error, status_code=400, **options)
+
+    assert new.body == old.body
+    assert new.status_code == 400
+
+
+def test_orjson_response_matches_json_response() -> None:
+    content = {"name": "Москва", "values": [1, 2.5, None, True], "nested": {"a": []}}
+
+    assert ORJSONResponse(content).body == JSONResponse(content).body
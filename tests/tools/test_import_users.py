@@ -0,0 +1,65 @@
+import io
+import json
+
+from src.auth.schemas import HashedUser, NewUser
+from src.auth.security import hash_password
+from src.tools import import_users
+
+
+def validated(file: io.StringIO, file_format: str) -> tuple[list, list]:
+    errors = io.StringIO()
+    report = import_users.ImportReport(errors)
+    rows = list(import_users.read_rows(file, file_format))
+    users = import_users._validate_chunk(rows, report)
+    return users, [json.loads(line) for line in errors.getvalue().splitlines()]
+
+
+def test_read_csv_rows() -> None:
+    password_hash = hash_password("P@$$w0rd1")
+    file = io.StringIO(
+        "email,password,password_hash,is_admin\n"
+        "user1@mail.com,P@$$w0rd1,,true\n"
+        "not-an-email,P@$$w0rd1,,\n"
+        f"user3@mail.com,,{password_hash},\n"
+    )
+
+    users, errors = validated(file, "csv")
+
+    assert [(line, type(user)) for line, user in users] == [
+        (2, NewUser),
+        (4, HashedUser),
+    ]
+    assert users[0][1].is_admin is True
+    assert [error["line"] for error in errors] == [3]
+
+
+def test_read_ndjson_rows() -> None:
+    file = io.StringIO(
+        '{"email": "user1@mail.com", "password": "P@$$w0rd1"}\n'
+        "\n"
+        "{broken\n"
+        '["user3@mail.com"]\n'
+        '{"email": "user5@mail.com", "password": "weak"}\n'
+    )
+
+    users, errors = validated(file, "ndjson")
+
+    assert [line for line, _ in users] == [1]
+    assert [error["line"] for error in errors] == [3, 4, 5]
+
+
+def test_rejected_rows_dont_leak_passwords() -> None:
+    file = io.StringIO(
+        '{"email": "user1@mail.com", "password": "weakpassword"}\n'
+        '{"email": "user2@mail.com", "password_hash": "$2b$12$secrethash"}\n'
+    )
+
+    users, errors = validated(file, "ndjson")
+
+    assert not users
+    assert [error["error"].split(":")[0] for error in errors] == [
+        "password",
+        "password_hash",
+    ]
+    assert "weakpassword" not in json.dumps(errors)
+    assert "secrethash" not in json.dumps(errors)
@@ -0,0 +1,36 @@
+import pytest
+
+from src.weather_service import cache
+
+
+class FakeLock:
+    async def acquire(self) -> bool:
+        return True
+
+    async def release(self) -> None:
+        pass
+
+
+@pytest.fixture
+def fake_redis(monkeypatch: pytest.MonkeyPatch) -> dict[str, str]:
+    storage: dict[str, str] = {}
+
+    async def get_by_key(key):
+        return storage.get(key)
+
+    async def get_by_keys(keys):
+        return [storage.get(key) for key in keys]
+
+    async def set_redis_keys(redis_data, **kwargs):
+        storage.update({data.key: data.value for data in redis_data})
+
+    async def publish(*args):
+        pass
+
+    monkeypatch.setattr(cache, "get_by_key", get_by_key)
+    monkeypatch.setattr(cache, "get_by_keys", get_by_keys)
+    monkeypatch.setattr(cache, "set_redis_keys", set_redis_keys)
+    monkeypatch.setattr(cache, "publish", publish)
+    monkeypatch.setattr(cache, "get_lock", lambda *args: FakeLock())
+    cache.memory_cache.clear()
+    return storage
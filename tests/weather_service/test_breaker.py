@@ -0,0 +1,50 @@
+import pytest
+
+from src.weather_service import breaker as breaker_module
+from src.weather_service.breaker import CircuitBreaker
+from src.weather_service.constants import BreakerState
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    now = [1000.0]
+    monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_on_failure_rate(clock: list[float]) -> None:
+    breaker = CircuitBreaker("test", min_calls=4, failure_rate=0.5, open_seconds=10)
+
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state is BreakerState.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state is BreakerState.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_probes(clock: list[float]) -> None:
+    breaker = CircuitBreaker("test", min_calls=1, open_seconds=10, half_open_calls=2)
+    breaker.record_failure()
+
+    clock[0] += 10
+    assert breaker.state is BreakerState.HALF_OPEN
+    assert breaker.allow()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    breaker.record_success()
+    assert breaker.state is BreakerState.CLOSED
+
+
+def test_breaker_reopens_on_failed_probe(clock: list[float]) -> None:
+    breaker = CircuitBreaker("test", min_calls=1, open_seconds=10)
+    breaker.record_failure()
+
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state is BreakerState.OPEN
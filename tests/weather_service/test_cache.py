@@ -0,0 +1,174 @@
+import asyncio
+import time
+
+import pytest
+
+from src.weather_service import cache
+from src.weather_service.cache import CacheEntry, MemoryCache, build_cache_key
+from src.weather_service.schemas import Coordinates, Location
+
+
+def test_cache_entry_roundtrip() -> None:
+    entry = CacheEntry(value='{"a":"b|c"}', expires_at=time.time() + 60, delta=0.2)
+
+    assert CacheEntry.loads(entry.dumps()) == entry
+    assert not entry.is_stale
+    assert CacheEntry(value="", expires_at=time.time() - 1).should_refresh(beta=1.0)
+
+
+def test_build_cache_key_is_canonical() -> None:
+    assert build_cache_key("weather", Location(city="Moscow ", country="RU")) == (
+        build_cache_key("weather", Location(city="moscow", country="ru"))
+    )
+    assert build_cache_key("location", Coordinates(lat=55.75, lon=37.61)) == (
+        build_cache_key("location", Coordinates(lon=37.6112, lat=55.7504))
+    )
+    assert build_cache_key("location", Coordinates(lat=55.75, lon=37.61)) != (
+        build_cache_key("weather", Coordinates(lat=55.75, lon=37.61))
+    )
+
+
+def test_coordinates_quantize_to_grid_nodes() -> None:
+    coordinate = Coordinates(lat=55.7504, lon=37.6112)
+
+    assert coordinate.quantize(0.01) == Coordinates(lat=55.75, lon=37.61)
+    assert coordinate.quantize(0.25) == Coordinates(lat=55.75, lon=37.5)
+    assert Coordinates(lat=55.8, lon=37.7).quantize(0.25) == (
+        Coordinates(lat=55.75, lon=37.75)
+    )
+    assert coordinate.quantize(5) == Coordinates(lat=55, lon=40)
+
+
+def test_memory_cache_evicts_least_recently_used() -> None:
+    memory = MemoryCache(max_items=2, max_bytes=1024)
+    entry = CacheEntry(value="value", expires_at=time.time() + 60)
+
+    memory.set("a", entry, stale_ttl=0)
+    memory.set("b", entry, stale_ttl=0)
+    memory.get("a")
+    memory.set("c", entry, stale_ttl=0)
+
+    assert memory.get("b") is None
+    assert memory.get("a") == entry
+    assert memory.stats()["evictions"] == 1
+    assert memory.stats()["hits"] == 2
+
+
+def test_memory_cache_drops_value_replaced_by_oversized_one() -> None:
+    memory = MemoryCache(max_items=2, max_bytes=16)
+
+    memory.set("a", CacheEntry(value="old", expires_at=time.time() + 60), 0)
+    memory.set("a", CacheEntry(value="x" * 16, expires_at=time.time() + 60), 0)
+
+    assert memory.get("a") is None
+    assert memory.stats()["bytes"] == 0
+
+
+async def test_cached_call_coalesces_misses(fake_redis: dict[str, str]) -> None:
+    calls = 0
+
+    async def loader() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(
+        *(cache.cached_call("key", loader, 60) for _ in range(10))
+    )
+
+    assert results == ["value"] * 10
+    assert calls == 1
+    assert CacheEntry.loads(fake_redis["key"]).value == "value"
+
+
+async def test_cached_call_serves_stale(fake_redis: dict[str, str]) -> None:
+    fake_redis["key"] = CacheEntry(value="stale", expires_at=time.time() - 1).dumps()
+
+    async def loader() -> str:
+        return "fresh"
+
+    assert await cache.cached_call("key", loader, 60) == "stale"
+    await asyncio.sleep(0.01)  # let the background refresh finish
+    assert await cache.cached_call("key", loader, 60) == "fresh"
+
+
+async def test_cached_call_reloads_unreadable_entry(fake_redis: dict[str, str]) -> None:
+    fake_redis["key"] = '{"value": "old format"}'
+
+    async def loader() -> str:
+        return "fresh"
+
+    assert await cache.read_entries(["key"]) == [None]
+    assert await cache.cached_call("key", loader, 60) == "fresh"
+    assert CacheEntry.loads(fake_redis["key"]).value == "fresh"
+
+
+async def test_cached_call_many_waits_for_other_worker(
+    fake_redis: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class HeldLock:
+        async def acquire(self) -> bool:
+            return False  # another worker is loading the key
+
+    monkeypatch.setattr(cache, "get_lock", lambda *args: HeldLock())
+
+    async def loader() -> str:
+        raise AssertionError("the key is loaded by the other worker")
+
+    async def other_worker() -> None:
+        await asyncio.sleep(0.1)
+        fake_redis["key"] = CacheEntry(
+            value="value", expires_at=time.time() + 60
+        ).dumps()
+
+    (values, errors), _ = await asyncio.gather(
+        cache.cached_call_many({"key": loader}, 60), other_worker()
+    )
+
+    assert values == {"key": "value"}
+    assert errors == {}
+
+
+async def test_cached_call_many_writes_misses_at_once(
+    fake_redis: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    writes: list[list[str]] = []
+    messages: list[str] = []
+
+    async def set_redis_keys(redis_data, **kwargs):
+        writes.append([data.key for data in redis_data])
+
+    async def publish(channel: str, message: str) -> None:
+        messages.append(message)
+
+    monkeypatch.setattr(cache, "set_redis_keys", set_redis_keys)
+    monkeypatch.setattr(cache, "publish", publish)
+
+    def loader(value: str):
+        async def load() -> str:
+            return value
+
+        return load
+
+    values, errors = await cache.cached_call_many(
+        {key: loader(key) for key in ("a", "b", "c")}, 60
+    )
+
+    assert values == {"a": "a", "b": "b", "c": "c"}
+    assert errors == {}
+    assert writes == [["a", "b", "c"]]
+    assert [message.split("\n")[1:] for message in messages] == [["a", "b", "c"]]
+
+
+async def test_cached_call_many_writes_late_loads(fake_redis: dict[str, str]) -> None:
+    async def loader() -> str:
+        await asyncio.sleep(0.05)
+        return "value"
+
+    values, errors = await cache.cached_call_many({"key": loader}, 60, timeout=0.01)
+    assert values == {}
+    assert isinstance(errors["key"], TimeoutError)
+
+    await asyncio.sleep(0.1)  # the shared call outlives the batch
+    assert CacheEntry.loads(fake_redis["key"]).value == "value"
@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any
+
+import httpx
+import pytest
+
+from src.weather_service import client as client_module
+from src.weather_service import limiter as limiter_module
+from src.weather_service import service
+from src.weather_service.breaker import CircuitBreaker
+from src.weather_service.client import Client
+from src.weather_service.config import weather_service_config
+from src.weather_service.constants import BreakerState
+from src.weather_service.exceptions import UpstreamTimeoutError
+from src.weather_service.limiter import TokenBucketLimiter
+from src.weather_service.schemas import Coordinates
+
+
+@pytest.fixture
+def breaker(monkeypatch: pytest.MonkeyPatch) -> CircuitBreaker:
+    breaker = CircuitBreaker("weather", min_calls=1)
+    monkeypatch.setitem(client_module.breakers, "weather", breaker)
+    return breaker
+
+
+async def test_timeouts_are_not_retried(
+    breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls = 0
+
+    async def send(self, url: str, params: dict, timeout: Any = None) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        raise httpx.ReadTimeout("upstream hung")
+
+    monkeypatch.setattr(Client, "_send", send)
+
+    with pytest.raises(UpstreamTimeoutError):
+        await Client(None)._get("weather", Client.BASE_URL, {})
+
+    assert calls == 1
+    assert breaker.state is BreakerState.OPEN
+
+
+async def test_fetch_weather_goes_through_limiter_and_transport(
+    breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    leased: list[int] = []
+
+    async def script(keys, args):
+        leased.append(args[2])
+        return args[2]
+
+    monkeypatch.setattr(limiter_module, "register_script", lambda _: script)
+    monkeypatch.setattr(client_module, "limiter", TokenBucketLimiter("key", lease=5))
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, content=b'{"ok":true}')
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        body = await Client(http).fetch_weather(Coordinates(lat=55.75, lon=37.61))
+
+    assert body == b'{"ok":true}'
+    assert len(requests) == 1
+    assert requests[0].url.params["lat"] == "55.75"
+    assert leased == [5]
+    assert breaker.stats().calls == 1
+
+
+async def test_hung_upstream_in_fan_out_opens_breaker(
+    breaker: CircuitBreaker, fake_redis: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def acquire() -> None:
+        pass
+
+    monkeypatch.setattr(client_module.limiter, "acquire", acquire)
+    monkeypatch.setattr(weather_service_config, "WEATHER_FAN_OUT_TASK_TIMEOUT", 0.05)
+    read_timeouts: list[float] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        # a hung upstream, the transport gives up after the read timeout
+        read_timeouts.append(request.extensions["timeout"]["read"])
+        await asyncio.sleep(read_timeouts[-1])
+        raise httpx.ReadTimeout("upstream hung", request=request)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        results = await service.get_weathers(
+            Client(http), [Coordinates(lat=55.75, lon=37.61)]
+        )
+        await asyncio.sleep(0.2)  # the shared call outlives the fan-out task
+
+    assert isinstance(results[0], (TimeoutError, UpstreamTimeoutError))
+    assert read_timeouts == [0.05]
+    assert breaker.state is BreakerState.OPEN
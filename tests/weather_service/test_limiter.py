@@ -0,0 +1,39 @@
+import pytest
+
+from src.weather_service import limiter as limiter_module
+from src.weather_service.exceptions import UpstreamRateLimitedError
+from src.weather_service.limiter import TokenBucketLimiter
+
+
+@pytest.fixture
+def leases(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    """Tokens granted by the redis bucket for the consecutive leases"""
+    granted: list[int] = []
+
+    async def script(keys, args):
+        return granted.pop(0) if granted else 0
+
+    monkeypatch.setattr(limiter_module, "register_script", lambda _: script)
+    return granted
+
+
+async def test_limiter_spends_leased_tokens_locally(leases: list[int]) -> None:
+    limiter = TokenBucketLimiter("key", lease=5)
+    leases.extend([5, 5])
+
+    for _ in range(7):
+        await limiter.acquire()
+
+    assert limiter.stats()["granted"] == 7
+    assert limiter.stats()["leased"] == 3
+    assert not leases
+
+
+async def test_limiter_sheds_when_quota_is_exhausted(leases: list[int]) -> None:
+    limiter = TokenBucketLimiter("key", per_minute=6000, max_wait=0.05)
+
+    with pytest.raises(UpstreamRateLimitedError):
+        await limiter.acquire()
+
+    assert limiter.stats()["queued"] == 1
+    assert limiter.stats()["shed"] == 1
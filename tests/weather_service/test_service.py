@@ -0,0 +1,129 @@
+import json
+import time
+
+from src.weather_service import service
+from src.weather_service.cache import CacheEntry, build_cache_key
+from src.weather_service.config import weather_service_config
+from src.weather_service.exceptions import InvalidResponseError
+from src.weather_service.schemas import Coordinates, Location
+
+MOSCOW = {"name": "Moscow", "lat": 55.7504461, "lon": 37.6174943, "country": "RU"}
+
+
+def weather_payload(coordinate: Coordinates) -> dict:
+    return {
+        "coord": {"lon": coordinate.lon, "lat": coordinate.lat},
+        "base": "stations",
+        "main": {"temp": 20.1, "feels_like": 19.5, "temp_min": 19, "temp_max": 21},
+        "wind": {"speed": 3.2, "deg": 180},
+        "dt": 1717000000,
+        "sys": {"country": "RU", "sunrise": 1716940000, "sunset": 1717000000},
+        "timezone": 10800,
+        "id": 524901,
+        "name": "Moscow",
+        "cod": 200,
+    }
+
+
+class FakeClient:
+    def __init__(self, locations: list[dict] | None = None):
+        self.locations = locations or []
+        self.calls = 0
+
+    async def fetch_location(
+        self, loc: Location, limit: int = 5, *, timeout: float | None = None
+    ) -> bytes:
+        self.calls += 1
+        return json.dumps(self.locations).encode()
+
+    async def fetch_weather(
+        self, coordinate: Coordinates, *, timeout: float | None = None
+    ) -> bytes:
+        self.calls += 1
+        return json.dumps(weather_payload(coordinate)).encode()
+
+
+async def test_get_location_is_cached(fake_redis: dict[str, str]) -> None:
+    client = FakeClient([MOSCOW])
+
+    first = await service.get_location(client, Location(city="Moscow"))
+    second = await service.get_location(client, Location(city="MOSCOW", country="ru"))
+
+    assert first == second
+    assert first.entries[0].name == "Moscow"
+    assert client.calls == 1
+
+
+async def test_get_location_negative_cache(fake_redis: dict[str, str]) -> None:
+    client = FakeClient([])
+    loc = Location(city="Nowhere")
+
+    assert (await service.get_location(client, loc)).count == 0
+    assert (await service.get_location(client, loc)).count == 0
+
+    entry = CacheEntry.loads(fake_redis[build_cache_key("geocoding", loc)])
+    assert client.calls == 1
+    assert entry.expires_at <= (
+        time.time() + weather_service_config.GEOCODING_NEGATIVE_CACHE_TTL
+    )
+
+
+async def test_get_weathers_fetches_only_missed(fake_redis: dict[str, str]) -> None:
+    client = FakeClient()
+    cached = Coordinates(lat=55.75, lon=37.61)
+    await service.get_weather(client, cached)
+
+    weathers = await service.get_weathers(
+        client,
+        [
+            Coordinates(lat=55.7504, lon=37.6112),
+            Coordinates(lat=59.93, lon=30.31),
+            Coordinates(lat=59.9311, lon=30.3099),
+        ],
+    )
+
+    assert [weather.coord for weather in weathers] == [
+        cached,
+        Coordinates(lat=59.93, lon=30.31),
+        Coordinates(lat=59.93, lon=30.31),
+    ]
+    assert client.calls == 2
+
+
+async def test_get_weather_batch_dedupes_coordinates(
+    fake_redis: dict[str, str],
+) -> None:
+    client = FakeClient([MOSCOW])
+
+    results = await service.get_weather_batch(
+        client,
+        [
+            Location(city="Moscow"),
+            Coordinates(lat=55.75, lon=37.62),
+            Location(city="moscow"),
+        ],
+    )
+
+    assert [result.count for result in results] == [1, 1, 1]
+    assert results[0].entries[0] == results[1].entries[0] == results[2].entries[0]
+    assert client.calls == 2  # one geocoding and one weather request
+
+
+async def test_get_weathers_reports_failed_coordinates(
+    fake_redis: dict[str, str],
+) -> None:
+    class BrokenClient(FakeClient):
+        async def fetch_weather(
+            self, coordinate: Coordinates, *, timeout: float | None = None
+        ) -> bytes:
+            if coordinate.lat > 59:
+                raise InvalidResponseError("broken")
+            return await super().fetch_weather(coordinate)
+
+    results = await service.get_weathers(
+        BrokenClient(),
+        [Coordinates(lat=55.75, lon=37.61), Coordinates(lat=59.93, lon=30.31)],
+    )
+
+    assert results[0].name == "Moscow"
+    assert isinstance(results[1], InvalidResponseError)
@@ -0,0 +1,42 @@
+import asyncio
+
+from src.weather_service.utils import fan_out
+
+
+async def test_fan_out_returns_partial_results() -> None:
+    async def fast() -> str:
+        return "fast"
+
+    async def slow() -> str:
+        await asyncio.sleep(10)
+        return "slow"
+
+    async def broken() -> str:
+        raise ValueError("broken")
+
+    deadline = asyncio.get_running_loop().time() + 0.1
+    results, errors = await fan_out(
+        {"fast": fast, "slow": slow, "broken": broken}, deadline=deadline
+    )
+
+    assert results == {"fast": "fast"}
+    assert isinstance(errors["slow"], TimeoutError)
+    assert isinstance(errors["broken"], ValueError)
+
+
+async def test_fan_out_limits_concurrency() -> None:
+    running = 0
+    max_running = 0
+
+    async def call() -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    results, errors = await fan_out({f"{i}": call for i in range(10)}, concurrency=3)
+
+    assert len(results) == 10
+    assert not errors
+    assert max_running == 3